@@ -0,0 +1,71 @@
+from posts.storage import post_image_storage
+
+# Поле ответа: путь для .values().
+POST_FIELDS = {
+    'id': 'pk',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'modified': 'modified',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+}
+COMMENT_FIELDS = {
+    'id': 'pk',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+# Поля, без которых не построить курсор ленты.
+POST_KEY = ('pub_date', 'pk')
+COMMENT_KEY = ('created', 'pk')
+
+
+def image_url(name):
+    return post_image_storage.url(name) if name else None
+
+
+CONVERTERS = {
+    'image': image_url,
+}
+
+
+class FieldsError(ValueError):
+    pass
+
+
+def requested_fields(request, available):
+    """Поля из ?fields=a,b,c; без параметра — все доступные."""
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(available)
+    fields = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in available]
+    if unknown or not fields:
+        raise FieldsError(
+            'Неизвестные поля: {}. Доступны: {}'.format(
+                ', '.join(unknown), ', '.join(available)
+            )
+        )
+    return fields
+
+
+def value_paths(fields, available, key=()):
+    """Пути для .values(): выбранные поля и поля ключа пагинации."""
+    paths = [available[name] for name in fields]
+    return list(dict.fromkeys([*paths, *key]))
+
+
+def serialize(rows, fields, available):
+    """Словари ответа из строк .values() без создания моделей."""
+    return [
+        {
+            name: CONVERTERS.get(name, _same)(row[available[name]])
+            for name in fields
+        }
+        for row in rows
+    ]
+
+
+def _same(value):
+    return value
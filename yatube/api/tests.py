@@ -0,0 +1,126 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+from posts.utils import NUMBER_OF_COMMENTS_ON_PAGE
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {index}', author=cls.author, group=cls.group)
+            for index in range(15)
+        ]
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def walk(self, url):
+        ids = []
+        while url:
+            data = self.client.get(url).json()
+            ids.extend(post['id'] for post in data['results'])
+            url = data['next']
+        return ids
+
+    def newest_first(self):
+        return [post.pk for post in reversed(self.posts)]
+
+    def test_feeds_walk_by_cursor(self):
+        """Ленты обходятся курсором целиком и без повторов."""
+        urls = (
+            reverse('api:index'),
+            reverse('api:group_list', kwargs={'slug': 'group'}),
+            reverse('api:profile', kwargs={'username': 'author'}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.walk(url), self.newest_first())
+        self.client.force_login(self.reader)
+        self.assertEqual(
+            self.walk(reverse('api:follow_index') + '?limit=4'),
+            self.newest_first(),
+        )
+
+    def test_fields_selection(self):
+        """В ответе только запрошенные поля, неизвестные дают 400."""
+        url = reverse('api:index')
+        data = self.client.get(url + '?fields=id,author').json()
+        self.assertEqual(
+            data['results'][0], {'id': self.posts[-1].pk, 'author': 'author'})
+        self.assertIn('fields=id%2Cauthor', data['next'])
+        response = self.client.get(url + '?fields=id,password')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_queries_do_not_grow_with_page_size(self):
+        """Число запросов не зависит от числа постов на странице."""
+        def queries(limit):
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                self.client.get(
+                    reverse('api:profile', kwargs={'username': 'author'}),
+                    {'limit': limit},
+                )
+            return len(context)
+
+        self.assertEqual(queries(2), queries(15))
+
+    def test_batch_keeps_order(self):
+        """Пакетный запрос возвращает посты в порядке ids."""
+        ids = [self.posts[3].pk, 0, self.posts[1].pk]
+        response = self.client.get(
+            reverse('api:posts_batch'),
+            {'ids': ','.join(map(str, ids)), 'fields': 'id,text'},
+        )
+        data = response.json()
+        self.assertEqual(
+            [post['id'] for post in data['results']], [ids[0], ids[2]])
+        self.assertEqual(data['missing'], [0])
+
+    def test_post_detail_with_comments(self):
+        """Пост отдаётся с первой страницей комментариев и курсором."""
+        post = self.posts[0]
+        Comment.objects.bulk_create(
+            Comment(post=post, author=self.reader, text=f'Комментарий {i}')
+            for i in range(NUMBER_OF_COMMENTS_ON_PAGE + 3)
+        )
+        data = self.client.get(
+            reverse('api:post_detail', kwargs={'post_id': post.pk})).json()
+        self.assertEqual(data['text'], post.text)
+        self.assertEqual(data['group'], 'group')
+        comments = data['comments']
+        self.assertEqual(
+            len(comments['results']), NUMBER_OF_COMMENTS_ON_PAGE)
+        rest = self.client.get(comments['next']).json()
+        self.assertEqual(len(rest['results']), 3)
+        self.assertIsNone(rest['next'])
+
+    def test_errors_are_json(self):
+        """Ошибки отдаются в JSON с нужным статусом."""
+        cases = (
+            (reverse('api:follow_index'), HTTPStatus.UNAUTHORIZED),
+            (reverse('api:profile', kwargs={'username': 'nobody'}),
+             HTTPStatus.NOT_FOUND),
+            (reverse('api:index') + '?limit=1000', HTTPStatus.BAD_REQUEST),
+        )
+        for url, status in cases:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('error', response.json())
@@ -0,0 +1,228 @@
+from functools import wraps
+from http import HTTPStatus
+
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+
+from posts.caching import (cache_page_versioned, group_scopes,
+                           group_validators, index_scopes, index_validators,
+                           post_scopes, post_validators, profile_scopes,
+                           profile_validators)
+from posts.counters import group_stats, user_stats
+from posts.feeds import TimelineKeysPaginator
+from posts.models import Comment, Group, Post, User
+from posts.utils import (NUMBER_OF_COMMENTS_ON_PAGE, NUMBER_OF_POSTS_ON_PAGE,
+                         KeysetPaginator)
+from posts.views import SAVE_GENERATED_PAGE_FOR
+
+from .serializers import (COMMENT_FIELDS, COMMENT_KEY, POST_FIELDS, POST_KEY,
+                          FieldsError, requested_fields, serialize,
+                          value_paths)
+
+# Больше постов за один запрос API не отдаёт.
+API_MAX_LIMIT = 100
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=HTTPStatus.BAD_REQUEST):
+        super().__init__(message)
+        self.status = status
+
+
+def json_view(view_func):
+    """Отдаёт словарь из view как JSON, а ошибки — как {"error": ...}."""
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        try:
+            data = view_func(request, *args, **kwargs)
+        except FieldsError as error:
+            return _error(str(error), HTTPStatus.BAD_REQUEST)
+        except ApiError as error:
+            return _error(str(error), error.status)
+        except Http404:
+            return _error('Не найдено', HTTPStatus.NOT_FOUND)
+        return JsonResponse(data)
+    return _wrapped_view
+
+
+def _error(message, status):
+    return JsonResponse({'error': message}, status=status)
+
+
+def _limit(request):
+    raw = request.GET.get('limit')
+    if raw is None:
+        return NUMBER_OF_POSTS_ON_PAGE
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise ApiError('limit должен быть числом')
+    if not 1 <= limit <= API_MAX_LIMIT:
+        raise ApiError(f'limit должен быть от 1 до {API_MAX_LIMIT}')
+    return limit
+
+
+def _link(request, query):
+    """Ссылка на соседнюю страницу с теми же fields и limit."""
+    if not query:
+        return None
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    params.pop('page', None)
+    rest = params.urlencode()
+    return '{}?{}{}'.format(
+        request.path, f'{rest}&' if rest else '', query
+    )
+
+
+def _page(request, paginator):
+    return paginator.get_page(
+        request.GET.get('page'), request.GET.get('cursor')
+    )
+
+
+def _posts_feed(request, posts):
+    """Страница постов одним запросом к .values() и ссылки по курсору."""
+    fields = requested_fields(request, POST_FIELDS)
+    paginator = KeysetPaginator(
+        posts.values(*value_paths(fields, POST_FIELDS, POST_KEY)),
+        _limit(request),
+        offset_pages=1,
+    )
+    page = _page(request, paginator)
+    return {
+        'results': serialize(page, fields, POST_FIELDS),
+        'next': _link(request, paginator.next_query),
+        'previous': _link(request, paginator.previous_query),
+    }
+
+
+def _posts_by_ids(ids, fields):
+    rows = Post.objects.filter(pk__in=ids).values(
+        *value_paths(fields, POST_FIELDS, ('pk',))
+    )
+    by_id = {row['pk']: row for row in rows}
+    return [by_id[pk] for pk in ids if pk in by_id]
+
+
+def _comments(post_id, cursor=None):
+    paginator = KeysetPaginator(
+        Comment.objects.filter(post_id=post_id).values(
+            *value_paths(COMMENT_FIELDS, COMMENT_FIELDS, COMMENT_KEY)
+        ),
+        NUMBER_OF_COMMENTS_ON_PAGE,
+        ordering=COMMENT_KEY,
+        offset_pages=1,
+    )
+    page = paginator.get_page(cursor=cursor)
+    next_url = None
+    if paginator.next_query:
+        next_url = '{}?{}'.format(
+            reverse('api:post_comments', args=(post_id,)),
+            paginator.next_query,
+        )
+    return {
+        'results': serialize(page, COMMENT_FIELDS, COMMENT_FIELDS),
+        'next': next_url,
+    }
+
+
+@cache_page_versioned(
+    SAVE_GENERATED_PAGE_FOR, index_scopes, index_validators
+)
+@json_view
+def index(request):
+    return _posts_feed(request, Post.objects.all())
+
+
+@cache_page_versioned(
+    SAVE_GENERATED_PAGE_FOR, group_scopes, group_validators
+)
+@json_view
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.select_related('stats'), slug=slug)
+    data = _posts_feed(request, Post.objects.filter(group=group))
+    data['group'] = {
+        'slug': group.slug,
+        'title': group.title,
+        'description': group.description,
+        'posts': group_stats(group).posts,
+    }
+    return data
+
+
+@cache_page_versioned(
+    SAVE_GENERATED_PAGE_FOR, profile_scopes, profile_validators
+)
+@json_view
+def profile(request, username):
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    stats = user_stats(author)
+    data = _posts_feed(request, Post.objects.filter(author=author))
+    data['author'] = {
+        'username': author.username,
+        'posts': stats.posts,
+        'followers': stats.followers,
+        'following': stats.following,
+    }
+    return data
+
+
+@json_view
+def follow_index(request):
+    if not request.user.is_authenticated:
+        raise ApiError('Нужна авторизация', HTTPStatus.UNAUTHORIZED)
+    fields = requested_fields(request, POST_FIELDS)
+    paginator = TimelineKeysPaginator(request.user, _limit(request))
+    page = _page(request, paginator)
+    rows = _posts_by_ids([pk for _, pk in page], fields)
+    return {
+        'results': serialize(rows, fields, POST_FIELDS),
+        'next': _link(request, paginator.next_query),
+        'previous': _link(request, paginator.previous_query),
+    }
+
+
+@cache_page_versioned(
+    SAVE_GENERATED_PAGE_FOR, post_scopes, post_validators
+)
+@json_view
+def post_detail(request, post_id):
+    fields = requested_fields(request, POST_FIELDS)
+    rows = _posts_by_ids([post_id], fields)
+    if not rows:
+        raise Http404
+    data = serialize(rows, fields, POST_FIELDS)[0]
+    data['comments'] = _comments(post_id)
+    return data
+
+
+@json_view
+def post_comments(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    return _comments(post_id, request.GET.get('cursor'))
+
+
+@json_view
+def posts_batch(request):
+    """Посты по ?ids=1,2,3 в том же порядке; ненайденные — в missing."""
+    fields = requested_fields(request, POST_FIELDS)
+    try:
+        ids = [
+            int(pk) for pk in request.GET.get('ids', '').split(',') if pk
+        ]
+    except ValueError:
+        raise ApiError('ids должны быть числами через запятую')
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > API_MAX_LIMIT:
+        raise ApiError(f'Не больше {API_MAX_LIMIT} ids за запрос')
+    rows = _posts_by_ids(ids, fields)
+    found = {row['pk'] for row in rows}
+    return {
+        'results': serialize(rows, fields, POST_FIELDS),
+        'missing': [pk for pk in ids if pk not in found],
+    }
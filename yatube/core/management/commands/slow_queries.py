@@ -0,0 +1,50 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.slowqueries import read_log, summarize
+
+
+class Command(BaseCommand):
+    help = 'Сводка лога медленных запросов по отпечаткам SQL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--log', default=settings.SLOW_QUERY_LOG,
+            help='Файл лога; по умолчанию settings.SLOW_QUERY_LOG.',
+        )
+        parser.add_argument(
+            '--top', type=int, default=10,
+            help='Сколько отпечатков с наибольшим временем показать.',
+        )
+        parser.add_argument(
+            '--view', help='Только запросы этой view, например posts:index.',
+        )
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['log']):
+            raise CommandError(f'Нет файла {options["log"]}')
+        entries = read_log(options['log'])
+        if options['view']:
+            entries = (
+                entry for entry in entries if entry['view'] == options['view']
+            )
+        for group in summarize(entries)[:options['top']]:
+            self.stdout.write(
+                f'{group["fingerprint"]}  всего {group["total_ms"]:.1f} мс, '
+                f'{group["count"]} раз, среднее '
+                f'{group["total_ms"] / group["count"]:.1f} мс, '
+                f'максимум {group["max_ms"]:.1f} мс'
+            )
+            self.stdout.write(f'  {group["sql"]}')
+            for key, title in (('views', 'view'), ('locations', 'откуда')):
+                places = sorted(
+                    group[key].items(), key=lambda item: -item[1]
+                )
+                self.stdout.write(f'  {title}: ' + ', '.join(
+                    f'{place} ({count})' for place, count in places
+                ))
+            if group['plan']:
+                for line in group['plan'].splitlines():
+                    self.stdout.write(f'  план: {line}')
@@ -0,0 +1,292 @@
+import atexit
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Файл, в который складываются значения завершившихся процессов.
+MERGED_FILE = 'merged.json'
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+_lock = threading.Lock()
+_metrics = {}
+_local = threading.local()
+
+
+class Store:
+    """Значения метрик этого процесса и их файл в settings.METRICS_DIR.
+
+    Каждый процесс пишет свой файл не чаще раза в
+    settings.METRICS_FLUSH_INTERVAL секунд и при выходе, а страница
+    метрик складывает файлы всех процессов. Файлы завершившихся процессов
+    при этом сливаются в MERGED_FILE, так что каталог не растёт, а
+    счётчики не откатываются назад при перезапуске.
+    """
+
+    def __init__(self):
+        self.reset()
+        atexit.register(self.flush)
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.name = f'{self.pid}-{uuid.uuid4().hex}.json'
+        self.values = defaultdict(float)
+        self.flushed = time.monotonic()
+
+    def add(self, key, amount):
+        if os.getpid() != self.pid:
+            # Процесс-потомок после fork не должен дописывать чужие числа.
+            self.reset()
+        self.values[key] += amount
+
+    def maybe_flush(self):
+        if time.monotonic() - self.flushed >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        self.flushed = time.monotonic()
+        if not self.values:
+            return
+        with _lock:
+            data = [[*key, value] for key, value in self.values.items()]
+        _write(self.path(self.name), data)
+
+    def path(self, name):
+        return os.path.join(settings.METRICS_DIR, name)
+
+    def collect(self):
+        """Сумма значений по файлам всех процессов."""
+        self.flush()
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        totals = defaultdict(float)
+        with open(self.path('.lock'), 'w') as lock:
+            # Два процесса не должны слить один и тот же файл дважды.
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self.merge_dead()
+            for path in glob.glob(self.path('*.json')):
+                for name, suffix, labels, value in _read(path):
+                    totals[name, suffix, tuple(map(tuple, labels))] += value
+        return totals
+
+    def merge_dead(self):
+        dead = [
+            path for path in glob.glob(self.path('*-*.json'))
+            if not _alive(os.path.basename(path).split('-')[0])
+        ]
+        if not dead:
+            return
+        merged = defaultdict(float)
+        for path in [self.path(MERGED_FILE), *dead]:
+            for name, suffix, labels, value in _read(path):
+                merged[name, suffix, tuple(map(tuple, labels))] += value
+        _write(self.path(MERGED_FILE), [
+            [name, suffix, labels, value]
+            for (name, suffix, labels), value in merged.items()
+        ])
+        for path in dead:
+            os.remove(path)
+
+
+def _alive(pid):
+    try:
+        os.kill(int(pid), 0)
+    except ValueError:
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _read(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return []
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w') as file:
+        json.dump(data, file)
+    os.replace(path + '.tmp', path)
+
+
+store = Store()
+
+
+def _labels(names, values):
+    if set(values) != set(names):
+        raise ValueError(
+            f'Ожидались метки {names}, получены {sorted(values)}'
+        )
+    return tuple((name, str(values[name])) for name in names)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        _metrics[name] = self
+
+    def inc(self, amount=1, **labels):
+        key = (self.name, '_total', _labels(self.labels, labels))
+        with _lock:
+            store.add(key, amount)
+        store.maybe_flush()
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(),
+                 buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        _metrics[name] = self
+
+    def observe(self, value, **labels):
+        labels = _labels(self.labels, labels)
+        with _lock:
+            for bound in self.buckets:
+                store.add((self.name, '_bucket', labels + (
+                    ('le', str(bound)),
+                )), int(value <= bound))
+            store.add((self.name, '_bucket', labels + (('le', '+Inf'),)), 1)
+            store.add((self.name, '_sum', labels), value)
+            store.add((self.name, '_count', labels), 1)
+        store.maybe_flush()
+
+
+def _escape(value):
+    return (
+        value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+    )
+
+
+def _sort_key(item):
+    (name, suffix, labels), _ = item
+    le = dict(labels).get('le')
+    bound = float('inf') if le in (None, '+Inf') else float(le)
+    rest = tuple(pair for pair in labels if pair[0] != 'le')
+    return name, rest, suffix != '_bucket', bound, suffix
+
+
+def exposition():
+    """Метрики всех процессов в текстовом формате Prometheus."""
+    samples = defaultdict(list)
+    for item in sorted(store.collect().items(), key=_sort_key):
+        samples[item[0][0]].append(item)
+    lines = []
+    for name in sorted(samples):
+        metric = _metrics.get(name)
+        if metric is not None:
+            family = name + '_total' if metric.kind == 'counter' else name
+            lines.append(f'# HELP {family} {metric.documentation}')
+            lines.append(f'# TYPE {family} {metric.kind}')
+        for (_, suffix, labels), value in samples[name]:
+            text = ','.join(
+                f'{label}="{_escape(label_value)}"'
+                for label, label_value in labels
+            )
+            text = f'{{{text}}}' if text else ''
+            # repr не округляет: большие счётчики не превращаются
+            # в 1.23457e+06 и rate() по ним не ступенчатый.
+            lines.append(f'{name}{suffix}{text} {float(value)!r}')
+    return '\n'.join(lines) + '\n'
+
+
+REQUESTS = Counter(
+    'yatube_http_requests', 'Запросы по view, методу и статусу.',
+    ('view', 'method', 'status'),
+)
+REQUEST_DURATION = Histogram(
+    'yatube_http_request_duration_seconds', 'Время ответа по view.',
+    ('view',),
+)
+DB_DURATION = Histogram(
+    'yatube_db_duration_seconds', 'Время SQL за один запрос по view.',
+    ('view',),
+)
+DB_QUERIES = Histogram(
+    'yatube_db_queries', 'Число SQL-запросов за один запрос по view.',
+    ('view',), buckets=(1, 2, 5, 10, 20, 50, 100),
+)
+PAGE_CACHE = Counter(
+    'yatube_page_cache_requests', 'Обращения к кэшу страниц по view.',
+    ('view', 'result'),
+)
+THUMBNAIL_DURATION = Histogram(
+    'yatube_thumbnail_duration_seconds',
+    'Время создания всех миниатюр одной картинки.',
+)
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else 'unresolved'
+
+
+@contextmanager
+def untracked():
+    """SQL внутри блока — служебный и не попадает в метрики запроса."""
+    previous = getattr(_local, 'untracked', False)
+    _local.untracked = True
+    try:
+        yield
+    finally:
+        _local.untracked = previous
+
+
+def is_untracked():
+    return getattr(_local, 'untracked', False)
+
+
+class MetricsMiddleware:
+    """Время ответа и SQL каждого запроса, по имени view."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sql = [0, 0.0]
+
+        def timed(execute, sql_text, params, many, context):
+            if is_untracked():
+                return execute(sql_text, params, many, context)
+            started = time.perf_counter()
+            try:
+                return execute(sql_text, params, many, context)
+            finally:
+                sql[0] += 1
+                sql[1] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(timed):
+            response = self.get_response(request)
+        view = view_name(request)
+        REQUEST_DURATION.observe(time.perf_counter() - started, view=view)
+        DB_DURATION.observe(sql[1], view=view)
+        DB_QUERIES.observe(sql[0], view=view)
+        REQUESTS.inc(
+            view=view, method=request.method, status=response.status_code
+        )
+        return response
@@ -0,0 +1,149 @@
+import logging
+import os
+import sys
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db.models.fields.related_descriptors import (
+    ForwardManyToOneDescriptor, ReverseManyToOneDescriptor)
+from django.template.base import Node
+
+logger = logging.getLogger(__name__)
+
+MODE_LOG = 'log'
+MODE_RAISE = 'raise'
+
+_local = threading.local()
+_installed = False
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+class Tracker:
+    """Ленивые загрузки связей за время одного запроса.
+
+    N+1 — это загрузка одной и той же связи у разных объектов, поэтому
+    для каждой связи запоминаются объекты и места загрузки.
+    """
+
+    def __init__(self):
+        self.loads = defaultdict(dict)
+
+    def record(self, relation, instance):
+        self.loads[relation].setdefault(
+            (type(instance), instance.pk), _location()
+        )
+
+    def repeated(self, threshold):
+        return {
+            relation: list(places.values())
+            for relation, places in self.loads.items()
+            if len(places) >= threshold
+        }
+
+    def report(self, threshold):
+        lines = []
+        for relation, places in sorted(self.repeated(threshold).items()):
+            where = ', '.join(sorted(set(places)))
+            lines.append(f'{relation}: {len(places)} объектов ({where})')
+        return '\n'.join(lines)
+
+
+def _location(skip=()):
+    """Строка шаблона, которую сейчас выводят, или строка кода проекта.
+
+    Файлы из skip, как и этот, строкой кода не считаются.
+    """
+    frame = sys._getframe(1)
+    code_line = None
+    while frame is not None:
+        if frame.f_code is Node.render_annotated.__code__:
+            node = frame.f_locals['self']
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                return f'{origin.template_name}:{token.lineno}'
+        filename = frame.f_code.co_filename
+        in_project = filename.startswith(settings.BASE_DIR)
+        skipped = filename == __file__ or filename in skip
+        if code_line is None and in_project and not skipped:
+            path = os.path.relpath(filename, settings.BASE_DIR)
+            code_line = f'{path}:{frame.f_lineno}'
+        frame = frame.f_back
+    return code_line or '?'
+
+
+def _record(relation, instance):
+    tracker = getattr(_local, 'tracker', None)
+    if tracker is not None:
+        tracker.record(relation, instance)
+
+
+def install():
+    """Подменяет дескрипторы связей, чтобы видеть ленивые загрузки.
+
+    Без активного Tracker обёртки только вызывают исходные методы.
+    """
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    get_object = ForwardManyToOneDescriptor.get_object
+    reverse_get = ReverseManyToOneDescriptor.__get__
+
+    def tracked_get_object(self, instance):
+        _record(f'{instance._meta.label}.{self.field.name}', instance)
+        return get_object(self, instance)
+
+    def tracked_reverse_get(self, instance, cls=None):
+        if instance is not None:
+            if getattr(self, 'reverse', True):
+                name = self.rel.get_accessor_name()
+            else:
+                name = self.field.name
+            prefetched = getattr(instance, '_prefetched_objects_cache', {})
+            if name not in prefetched:
+                _record(f'{instance._meta.label}.{name}', instance)
+        return reverse_get(self, instance, cls)
+
+    ForwardManyToOneDescriptor.get_object = tracked_get_object
+    ReverseManyToOneDescriptor.__get__ = tracked_reverse_get
+
+
+@contextmanager
+def track(mode, threshold=2, label=''):
+    """Собирает ленивые загрузки и сообщает о повторных.
+
+    В режиме MODE_RAISE повторная загрузка одной и той же связи
+    завершается NPlusOneError, в MODE_LOG — предупреждением в лог.
+    """
+    previous = getattr(_local, 'tracker', None)
+    tracker = _local.tracker = Tracker()
+    try:
+        yield tracker
+    finally:
+        _local.tracker = previous
+    report = tracker.report(threshold)
+    if report:
+        message = f'N+1 {label}\n{report}'.rstrip()
+        if mode == MODE_RAISE:
+            raise NPlusOneError(message)
+        logger.warning(message)
+
+
+class NPlusOneMiddleware:
+    """Проверяет каждый запрос на N+1 в режиме settings.NPLUSONE_MODE."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = settings.NPLUSONE_MODE
+        if not mode:
+            return self.get_response(request)
+        with track(mode, settings.NPLUSONE_THRESHOLD, request.path):
+            return self.get_response(request)
@@ -0,0 +1,93 @@
+import cProfile
+import os
+import pstats
+import random
+import threading
+
+from django.conf import settings
+from django.core import signing
+
+SIGNATURE_SALT = 'core.profiling'
+SIGNATURE_VALUE = 'profile'
+
+# cProfile нельзя включить в двух потоках сразу, поэтому одновременно
+# профилируется только один запрос; остальные идут без профиля.
+_lock = threading.Lock()
+_stats = {}
+
+
+def signed_token():
+    """Значение заголовка settings.PROFILING_HEADER для ручного замера."""
+    return signing.TimestampSigner(salt=SIGNATURE_SALT).sign(SIGNATURE_VALUE)
+
+
+def _signed(request):
+    header = 'HTTP_' + settings.PROFILING_HEADER.upper().replace('-', '_')
+    token = request.META.get(header)
+    if not token:
+        return False
+    try:
+        value = signing.TimestampSigner(salt=SIGNATURE_SALT).unsign(
+            token, max_age=settings.PROFILING_SIGNATURE_MAX_AGE
+        )
+    except signing.BadSignature:
+        return False
+    return value == SIGNATURE_VALUE
+
+
+def sampled(request):
+    rate = settings.PROFILING_SAMPLE_RATE
+    return (rate > 0 and random.random() < rate) or _signed(request)
+
+
+def profile_path(view_name, pid=None):
+    name = view_name.replace(':', '.').replace(os.sep, '_')
+    return os.path.join(
+        settings.PROFILING_DIR, f'{name}.{pid or os.getpid()}.prof'
+    )
+
+
+def save(view_name, profiler):
+    """Добавляет профиль запроса к профилю view и пишет его на диск.
+
+    Файл в формате pstats, по одному на view и процесс: его открывают
+    python -m pstats, snakeviz и другие просмотрщики, а файлы разных
+    процессов складываются через pstats.Stats(*пути).
+    """
+    stats = _stats.get(view_name)
+    if stats is None:
+        stats = _stats[view_name] = pstats.Stats(profiler)
+    else:
+        stats.add(profiler)
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    path = profile_path(view_name)
+    stats.dump_stats(path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+
+class ProfilingMiddleware:
+    """Профилирует долю settings.PROFILING_SAMPLE_RATE запросов.
+
+    Запросы с подписанным заголовком settings.PROFILING_HEADER
+    профилируются всегда. Для остальных вся цена — одно random().
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not sampled(request) or not _lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            match = request.resolver_match
+            if match is not None:
+                save(match.view_name, profiler)
+            return response
+        finally:
+            _lock.release()
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.utils import timezone
+
+from . import metrics
+from .nplusone import _location
+
+logger = logging.getLogger(__name__)
+
+_NORMALIZE = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\s+'), ' '),
+    (re.compile(r'\bIN \(\?(?:, \?)*\)', re.IGNORECASE), 'IN (...)'),
+    (re.compile(r'\(\?(?:, \?)*\)(?:, \(\?(?:, \?)*\))+'), '(...)'),
+)
+
+_write_lock = threading.Lock()
+
+
+def normalize(sql):
+    """SQL без значений: литералы и параметры заменены на ?, списки
+    IN и строки VALUES свёрнуты, так что запросы одной формы совпадают.
+    """
+    for pattern, replacement in _NORMALIZE:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def fingerprint(sql):
+    return hashlib.md5(normalize(sql).encode()).hexdigest()[:16]
+
+
+def explain(sql, params):
+    """План запроса или None, если его нельзя получить."""
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return None
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else (
+        'EXPLAIN '
+    )
+    try:
+        with metrics.untracked(), connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            rows = cursor.fetchall()
+    except DatabaseError:
+        return None
+    return '\n'.join(str(row[-1]) for row in rows)
+
+
+def record(sql, params, duration, request, many=False):
+    """Пишет медленный запрос в лог; у executemany плана нет."""
+    entry = {
+        'time': timezone.now().isoformat(),
+        'duration_ms': round(duration * 1000, 2),
+        'fingerprint': fingerprint(sql),
+        'sql': normalize(sql),
+        'view': metrics.view_name(request),
+        'location': _location(skip=(__file__, metrics.__file__)),
+        'many': many,
+        'plan': None if many else explain(sql, params),
+    }
+    logger.warning(
+        'Медленный запрос %.1f мс в %s (%s): %s\n%s',
+        entry['duration_ms'], entry['view'], entry['location'],
+        entry['sql'], entry['plan'] or '',
+    )
+    line = json.dumps(entry, ensure_ascii=False) + '\n'
+    with _write_lock, open(settings.SLOW_QUERY_LOG, 'a') as file:
+        file.write(line)
+
+
+class SlowQueryMiddleware:
+    """Пишет в settings.SLOW_QUERY_LOG запросы дольше порога.
+
+    Каждая запись — отпечаток SQL, view, строка шаблона или кода, из
+    которой пришёл запрос, и план запроса. Сводку по отпечаткам строит
+    команда slow_queries.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        threshold = settings.SLOW_QUERY_THRESHOLD_MS
+        if threshold is None:
+            return self.get_response(request)
+
+        def timed(execute, sql, params, many, context):
+            if metrics.is_untracked():
+                return execute(sql, params, many, context)
+            started = time.perf_counter()
+            result = execute(sql, params, many, context)
+            duration = time.perf_counter() - started
+            if duration * 1000 >= threshold:
+                record(sql, params, duration, request, many)
+            return result
+
+        with connection.execute_wrapper(timed):
+            return self.get_response(request)
+
+
+def summarize(entries):
+    """Записи лога, сгруппированные по отпечатку, от большего времени."""
+    groups = {}
+    for entry in entries:
+        group = groups.setdefault(entry['fingerprint'], {
+            'fingerprint': entry['fingerprint'],
+            'sql': entry['sql'],
+            'count': 0,
+            'total_ms': 0.0,
+            'max_ms': 0.0,
+            'plan': None,
+            'views': {},
+            'locations': {},
+        })
+        group['count'] += 1
+        group['total_ms'] += entry['duration_ms']
+        if entry['duration_ms'] >= group['max_ms']:
+            group['max_ms'] = entry['duration_ms']
+            group['plan'] = entry['plan']
+        for key, value in (('views', entry['view']),
+                           ('locations', entry['location'])):
+            group[key][value] = group[key].get(value, 0) + 1
+    return sorted(groups.values(), key=lambda group: -group['total_ms'])
+
+
+def read_log(path):
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
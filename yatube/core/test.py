@@ -1,6 +1,32 @@
+import glob
+import json
+import os
+import pstats
+import shutil
+import subprocess
+import tempfile
 from http import HTTPStatus
+from io import StringIO
 
-from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.template.loader import render_to_string
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Post
+
+from .metrics import MERGED_FILE, REQUESTS, Histogram, exposition, store
+from .nplusone import MODE_RAISE, NPlusOneError, track
+from .profiling import profile_path, signed_token
+from .slowqueries import (SlowQueryMiddleware, fingerprint, normalize,
+                          read_log)
+
+User = get_user_model()
 
 
 class ViewTestClass(TestCase):
@@ -8,3 +34,236 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertTemplateUsed(response, 'core/404.html')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class NPlusOneTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.post = Post.objects.create(
+            text='Пост', author=User.objects.create_user(username='author'))
+        for i in range(3):
+            Comment.objects.create(
+                post=cls.post,
+                author=User.objects.create_user(username=f'reader{i}'),
+                text='Комментарий',
+            )
+
+    def render_comments(self, comments):
+        return render_to_string(
+            'posts/includes/comments.html',
+            {'post': self.post, 'comments': comments},
+        )
+
+    def test_repeated_lazy_load_reported_with_template_line(self):
+        with self.assertRaises(NPlusOneError) as error:
+            with track(MODE_RAISE):
+                self.render_comments(Comment.objects.all())
+        self.assertIn('posts.Comment.author: 3', str(error.exception))
+        self.assertIn('posts/includes/comments.html:', str(error.exception))
+
+    def test_select_related_passes(self):
+        with track(MODE_RAISE):
+            self.render_comments(Comment.objects.select_related('author'))
+
+    @override_settings(NPLUSONE_MODE=MODE_RAISE)
+    def test_middleware_checks_pages(self):
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+class ProfilingTest(TestCase):
+    def setUp(self):
+        self.profiles = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profiles, ignore_errors=True)
+
+    def profiled(self, **headers):
+        with override_settings(PROFILING_DIR=self.profiles):
+            self.client.get(reverse('posts:index'), **headers)
+        return glob.glob(os.path.join(self.profiles, '*.prof'))
+
+    def test_unsampled_request_writes_nothing(self):
+        self.assertEqual(self.profiled(HTTP_X_PROFILE='подделка'), [])
+
+    def test_signed_header_profiles_request_per_view(self):
+        self.profiled(HTTP_X_PROFILE=signed_token())
+        with override_settings(PROFILING_DIR=self.profiles):
+            path = profile_path('posts:index')
+        self.assertEqual(
+            self.profiled(HTTP_X_PROFILE=signed_token()), [path])
+        calls = pstats.Stats(path).stats
+        self.assertTrue(any(
+            name == 'index' and filename.endswith(os.path.join(
+                'posts', 'views.py'))
+            for filename, _, name in calls
+        ))
+
+    @override_settings(PROFILING_SAMPLE_RATE=1.0)
+    def test_sample_rate_profiles_without_header(self):
+        self.assertEqual(len(self.profiled()), 1)
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        overridden = override_settings(METRICS_DIR=directory)
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        store.reset()
+        cache.clear()
+
+    def test_requests_and_page_cache_are_counted(self):
+        for _ in range(2):
+            self.client.get(reverse('posts:index'))
+        text = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('# TYPE yatube_http_requests_total counter', text)
+        self.assertIn(
+            'yatube_http_requests_total{view="posts:index",method="GET",'
+            'status="200"} 2.0', text)
+        self.assertIn(
+            'yatube_http_request_duration_seconds_count'
+            '{view="posts:index"} 2.0', text)
+        self.assertIn(
+            'yatube_page_cache_requests_total'
+            '{view="posts:index",result="miss"} 1.0', text)
+        self.assertIn(
+            'yatube_page_cache_requests_total'
+            '{view="posts:index",result="hit"} 1.0', text)
+
+    def test_values_of_other_processes_are_summed(self):
+        REQUESTS.inc(view='posts:index', method='GET', status=200)
+        store.flush()
+        # Файл, оставленный другим процессом.
+        store.reset()
+        REQUESTS.inc(view='posts:index', method='GET', status=200)
+        self.assertIn(
+            'yatube_http_requests_total{view="posts:index",method="GET",'
+            'status="200"} 2.0', exposition())
+
+    def test_dead_process_files_are_merged(self):
+        process = subprocess.Popen(['true'])
+        process.wait()
+        dead = os.path.join(
+            settings.METRICS_DIR, f'{process.pid}-finished.json')
+        with open(dead, 'w') as file:
+            json.dump([[
+                'yatube_http_requests', '_total',
+                [['view', 'posts:index'], ['method', 'GET'],
+                 ['status', '200']],
+                3,
+            ]], file)
+        REQUESTS.inc(view='posts:index', method='GET', status=200)
+        sample = (
+            'yatube_http_requests_total{view="posts:index",method="GET",'
+            'status="200"} 4.0')
+        self.assertIn(sample, exposition())
+        self.assertFalse(os.path.exists(dead))
+        self.assertEqual(
+            sorted(os.listdir(settings.METRICS_DIR)),
+            sorted(['.lock', MERGED_FILE, store.name]),
+        )
+        self.assertIn(sample, exposition())
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram('test_seconds', 'Тест.', buckets=(1, 2))
+        histogram.observe(1.5)
+        text = exposition()
+        self.assertIn('test_seconds_bucket{le="1"} 0.0', text)
+        self.assertIn('test_seconds_bucket{le="2"} 1.0', text)
+        self.assertIn('test_seconds_bucket{le="+Inf"} 1.0', text)
+        self.assertIn('test_seconds_sum 1.5', text)
+
+    def test_large_counter_exported_exactly(self):
+        REQUESTS.inc(1234567, view='posts:index', method='GET', status=200)
+        self.assertIn(
+            'yatube_http_requests_total{view="posts:index",method="GET",'
+            'status="200"} 1234567.0\n', exposition())
+
+    def test_endpoint_hidden_from_other_addresses(self):
+        response = self.client.get(
+            reverse('metrics'), REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class SlowQueryTest(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.log = os.path.join(directory, 'slow.jsonl')
+
+    def test_fingerprint_ignores_values(self):
+        self.assertEqual(
+            normalize("SELECT * FROM t WHERE id IN (1, 2, 3) AND x = 'a'"),
+            'SELECT * FROM t WHERE id IN (...) AND x = ?',
+        )
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id = %s LIMIT 10'),
+            fingerprint('SELECT  *  FROM t WHERE id = 5 LIMIT 20'),
+        )
+
+    def test_slow_queries_logged_with_view_and_plan(self):
+        Post.objects.create(
+            text='Пост', author=User.objects.create_user(username='slow'))
+        with override_settings(
+                SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_LOG=self.log):
+            with self.assertLogs('core.slowqueries', 'WARNING'):
+                self.client.get(reverse('posts:index'))
+        entries = list(read_log(self.log))
+        posts = [
+            entry for entry in entries if 'FROM "posts_post"' in entry['sql']
+        ]
+        self.assertTrue(posts)
+        self.assertEqual(posts[0]['view'], 'posts:index')
+        self.assertNotIn('core/', posts[0]['location'])
+        self.assertTrue(posts[0]['plan'])
+        out = StringIO()
+        call_command('slow_queries', log=self.log, top=1, stdout=out)
+        self.assertIn('posts:index', out.getvalue())
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=None)
+    def test_disabled_without_threshold(self):
+        with override_settings(SLOW_QUERY_LOG=self.log):
+            self.client.get(reverse('posts:index'))
+        self.assertFalse(os.path.exists(self.log))
+
+    def test_executemany_logged_without_plan(self):
+        def bulk_view(request):
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    'UPDATE posts_post SET text = %s WHERE id = %s',
+                    [('Один', 1), ('Два', 2)],
+                )
+            return HttpResponse()
+
+        with override_settings(
+                SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_LOG=self.log):
+            with self.assertLogs('core.slowqueries', 'WARNING'):
+                SlowQueryMiddleware(bulk_view)(RequestFactory().get('/'))
+        [entry] = read_log(self.log)
+        self.assertTrue(entry['many'])
+        self.assertIsNone(entry['plan'])
+        self.assertEqual(
+            entry['fingerprint'],
+            fingerprint('UPDATE posts_post SET text = %s WHERE id = %s'),
+        )
+
+    def index_queries(self, threshold):
+        """Сколько SQL метрики насчитали на одной сборке главной."""
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        with override_settings(
+                SLOW_QUERY_THRESHOLD_MS=threshold,
+                SLOW_QUERY_LOG=self.log, METRICS_DIR=directory):
+            store.reset()
+            self.client.get(reverse('posts:index'))
+            return store.collect()[
+                'yatube_db_queries', '_sum', (('view', 'posts:index'),)]
+
+    def test_explain_not_counted_in_metrics(self):
+        plain = self.index_queries(None)
+        with self.assertLogs('core.slowqueries', 'WARNING'):
+            logged = self.index_queries(0)
+        self.assertEqual(logged, plain)
@@ -1,7 +1,11 @@
 from http import HTTPStatus
 
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
 
+from .metrics import CONTENT_TYPE, exposition
+
 
 def page_not_found(request, exception):
     return render(
@@ -19,3 +23,9 @@ def csrf_failure(request, reason=''):
         {'path': request.path},
         status=HTTPStatus.FORBIDDEN
     )
+
+
+def metrics(request):
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        raise Http404
+    return HttpResponse(exposition(), content_type=CONTENT_TYPE)
@@ -1,17 +1,165 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 
 from .models import Comment, Follow, Group, Post
+from .search import POST_IDS_SQL, fts_enabled, fts_query
+
+# До скольких строк списки админки считаются точно.
+ADMIN_EXACT_COUNT_LIMIT = 10_000
+
+
+def estimated_count(model, using):
+    """Число строк таблицы по статистике базы или None, если её нет."""
+    conn = connections[using]
+    table = model._meta.db_table
+    with conn.cursor() as cursor:
+        if conn.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = to_regclass(%s)', [table]
+            )
+        elif conn.vendor == 'sqlite':
+            # sqlite_stat1 появляется только после ANALYZE.
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+            )
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute(
+                'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                [table],
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор списков админки, который не считает всю таблицу.
+
+    Без фильтров число строк берётся из статистики базы, если строк
+    больше ADMIN_EXACT_COUNT_LIMIT. С фильтрами и поиском строки
+    считаются не дальше этого предела: чтобы дойти до более дальних
+    страниц, фильтр нужно сузить.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > ADMIN_EXACT_COUNT_LIMIT:
+                return estimate
+        return queryset[:ADMIN_EXACT_COUNT_LIMIT].count()
+
+
+class RowAutocompleteSelect(AutocompleteSelect):
+    """Автодополнение, которое подписывает выбранное значение без запроса.
+
+    В списке с list_editable у каждой строки свой виджет, и обычный
+    AutocompleteSelect искал бы подпись отдельным запросом на строку.
+    Здесь подпись берётся у объекта, уже загруженного вместе со строкой.
+    """
+
+    selected = None
+
+    def optgroups(self, name, value, attr=None):
+        selected = self.selected
+        if selected is None or str(selected.pk) not in value:
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        label = self.choices.field.label_from_instance(selected)
+        options.append(
+            self.create_option(name, selected.pk, label, True, len(options))
+        )
+        return [(None, options, 0)]
+
+
+class PostChangeListForm(forms.ModelForm):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        widget = self.fields['group'].widget
+        widget = getattr(widget, 'widget', widget)
+        if self.instance.group_id:
+            widget.selected = self.instance.group
+
+
+class GroupAdmin(admin.ModelAdmin):
+    list_display = ("pk", "title", "slug")
+    search_fields = ("title", "slug")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 class PostAdmin(admin.ModelAdmin):
     list_display = ("pk", "text", "pub_date", "author", "group")
     list_editable = ("group",)
+    list_select_related = ("author", "group")
     search_fields = ("text",)
     list_filter = ("pub_date",)
+    date_hierarchy = "pub_date"
+    autocomplete_fields = ("author", "group")
+    empty_value_display = "-пусто-"
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_changelist_form(self, request, **kwargs):
+        kwargs.setdefault("form", PostChangeListForm)
+        return super().get_changelist_form(request, **kwargs)
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == "group":
+            kwargs["widget"] = RowAutocompleteSelect(
+                db_field.remote_field, self.admin_site,
+                using=kwargs.get("using"),
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по тексту идёт через FTS-индекс, а не LIKE '%...%'.
+        match = fts_query(search_term)
+        if not match or not fts_enabled():
+            return super().get_search_results(request, queryset, search_term)
+        # RawSQL в pk__in даёт IN ((...)), что SQLite читает как скаляр.
+        queryset = queryset.extra(
+            where=[f'posts_post.id IN ({POST_IDS_SQL})'], params=[match]
+        )
+        return queryset, False
+
+
+class CommentAdmin(admin.ModelAdmin):
+    list_display = ("pk", "text", "post", "author", "created")
+    list_select_related = ("post", "author")
+    search_fields = ("text",)
+    autocomplete_fields = ("post", "author")
+    # Порядок по первичному ключу не требует сортировки всей таблицы.
+    ordering = ("-pk",)
     empty_value_display = "-пусто-"
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class FollowAdmin(admin.ModelAdmin):
+    list_display = ("pk", "user", "author")
+    list_select_related = ("user", "author")
+    search_fields = ("user__username", "author__username")
+    autocomplete_fields = ("user", "author")
+    ordering = ("-pk",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
-admin.site.register(Group)
+admin.site.register(Group, GroupAdmin)
 admin.site.register(Post, PostAdmin)
-admin.site.register(Comment)
-admin.site.register(Follow)
+admin.site.register(Comment, CommentAdmin)
+admin.site.register(Follow, FollowAdmin)
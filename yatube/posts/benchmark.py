@@ -0,0 +1,184 @@
+import math
+import time
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.backends.utils import CursorWrapper
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Follow, Group, Post, User
+
+# Параметры seed_data для баз разного размера.
+BENCHMARK_SIZES = {
+    'small': {
+        'users': 200, 'groups': 10, 'posts': 2000,
+        'comments': 4000, 'follows': 1000,
+    },
+    'medium': {
+        'users': 2000, 'groups': 50, 'posts': 20_000,
+        'comments': 40_000, 'follows': 5000,
+    },
+    'large': {
+        'users': 20_000, 'groups': 200, 'posts': 200_000,
+        'comments': 400_000, 'follows': 20_000,
+    },
+}
+BENCHMARK_REPEAT = 20
+# Допустимый рост p95 и объёма данных относительно baseline; число
+# запросов расти не должно совсем.
+TIME_TOLERANCE = 0.5
+SIZE_TOLERANCE = 0.1
+
+
+class RowCounter:
+    def __init__(self):
+        self.rows = 0
+
+
+@contextmanager
+def counting_rows():
+    """Считает строки, которые код прочитал из курсоров базы."""
+    counter = RowCounter()
+
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        counter.rows += row is not None
+        return row
+
+    def fetchmany(self, *args):
+        rows = self.cursor.fetchmany(*args)
+        counter.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self.cursor.fetchall()
+        counter.rows += len(rows)
+        return rows
+
+    methods = {
+        'fetchone': fetchone,
+        'fetchmany': fetchmany,
+        'fetchall': fetchall,
+    }
+    for name, method in methods.items():
+        setattr(CursorWrapper, name, method)
+    try:
+        yield counter
+    finally:
+        for name in methods:
+            delattr(CursorWrapper, name)
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[max(math.ceil(share * len(ordered)) - 1, 0)]
+
+
+def targets():
+    """Запросы к view на самых нагруженных объектах базы.
+
+    Возвращает {имя view: (метод, url, данные, пользователь)}.
+    """
+    author = User.objects.annotate(total=Count('posts')).order_by(
+        '-total', 'pk'
+    ).first()
+    group = Group.objects.annotate(total=Count('posts')).order_by(
+        '-total', 'pk'
+    ).first()
+    post = Post.objects.annotate(total=Count('comments')).order_by(
+        '-total', 'pk'
+    ).first()
+    reader = User.objects.annotate(total=Count('follower')).order_by(
+        '-total', 'pk'
+    ).first() if Follow.objects.exists() else author
+    views = {
+        'index': ('get', reverse('posts:index'), None, None),
+        'profile': (
+            'get', reverse('posts:profile', args=(author.username,)),
+            None, None,
+        ),
+        'follow_index': ('get', reverse('posts:follow_index'), None, reader),
+        'post_create': ('post', reverse('posts:post_create'),
+                        {'text': 'Пост из бенчмарка'}, author),
+    }
+    if group is not None:
+        views['group_posts'] = (
+            'get', reverse('posts:group_list', args=(group.slug,)),
+            None, None,
+        )
+    if post is not None:
+        views['post_detail'] = (
+            'get', reverse('posts:post_detail', args=(post.pk,)),
+            None, None,
+        )
+        views['add_comment'] = (
+            'post', reverse('posts:add_comment', args=(post.pk,)),
+            {'text': 'Комментарий из бенчмарка'}, reader,
+        )
+    return views
+
+
+def measure(method, url, data=None, user=None, repeat=BENCHMARK_REPEAT):
+    """p50/p95 времени, запросы, строки и байты ответа одного view.
+
+    Кэш страниц сбрасывается перед каждым запросом, так что замеряется
+    полная сборка страницы. Первый запрос прогревочный.
+    """
+    client = Client()
+    if user is not None:
+        client.force_login(user)
+    request = getattr(client, method)
+    request(url, data)
+    timings = []
+    for _ in range(repeat):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            with counting_rows() as counter:
+                started = time.perf_counter()
+                response = request(url, data)
+                timings.append((time.perf_counter() - started) * 1000)
+    return {
+        'status': response.status_code,
+        'p50_ms': round(percentile(timings, 0.5), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'queries': len(queries),
+        'rows': counter.rows,
+        'bytes': len(response.content),
+    }
+
+
+def run(repeat=BENCHMARK_REPEAT, views=None):
+    results = {}
+    for name, (method, url, data, user) in sorted(targets().items()):
+        if views and name not in views:
+            continue
+        results[name] = measure(method, url, data, user, repeat)
+    return results
+
+
+def regressions(results, baseline, time_tolerance=TIME_TOLERANCE,
+                size_tolerance=SIZE_TOLERANCE):
+    """Описания показателей, которые хуже baseline сверх допуска."""
+    found = []
+    for size, views in results.items():
+        for view, current in views.items():
+            previous = baseline.get(size, {}).get(view)
+            if previous is None:
+                continue
+            limits = {
+                'queries': previous['queries'],
+                'p95_ms': previous['p95_ms'] * (1 + time_tolerance),
+                'rows': previous['rows'] * (1 + size_tolerance),
+                'bytes': previous['bytes'] * (1 + size_tolerance),
+            }
+            for metric, limit in limits.items():
+                if current[metric] > limit:
+                    found.append(
+                        f'{size}/{view}: {metric} {current[metric]} '
+                        f'> {previous[metric]}'
+                    )
+    return found
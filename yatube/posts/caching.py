@@ -0,0 +1,239 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers, quote_etag)
+from django.utils.http import http_date
+from django.views.decorators.cache import cache_page
+
+from core.metrics import PAGE_CACHE, view_name
+
+from .models import Post
+
+VERSION_KEY = 'posts:version:{}'
+SITE_SCOPE = 'site'
+# Кэши, которые у каждого процесса свои: bump() в одном процессе не
+# доходит до остальных.
+PROCESS_LOCAL_CACHES = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+def scope_versions(scopes):
+    """Текущие версии областей кэша; недостающие заводятся заново.
+
+    Новая версия начинается с текущего времени в миллисекундах, чтобы
+    вытесненный из кэша счётчик не вернулся к уже использованному
+    значению и не поднял старую страницу.
+    """
+    keys = [VERSION_KEY.format(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, int(time.time() * 1000), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump(*scopes):
+    """Повышает версии областей не меньше чем до текущего времени в мс.
+
+    Так версия заодно хранит время последнего изменения области и
+    годится для Last-Modified.
+    """
+    now = int(time.time() * 1000)
+    for scope in scopes:
+        key = VERSION_KEY.format(scope)
+        try:
+            version = cache.incr(key)
+        except ValueError:
+            scope_versions([scope])
+            continue
+        if version < now:
+            cache.incr(key, now - version)
+
+
+def version_time(versions):
+    return datetime.fromtimestamp(max(versions) / 1000, timezone.utc)
+
+
+def shared_cache():
+    return settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES
+
+
+def page_timeout(timeout):
+    """TTL страницы: длинный только в общем для всех процессов кэше.
+
+    В кэше процесса сигнал сбрасывает версии только у себя, и другие
+    процессы отдают старую страницу, пока она не истечёт.
+    """
+    if shared_cache():
+        return timeout
+    return min(timeout, settings.PAGE_LOCAL_CACHE_TIMEOUT)
+
+
+@checks.register(checks.Tags.caches)
+def check_page_cache(app_configs, **kwargs):
+    if shared_cache():
+        return []
+    return [checks.Warning(
+        'Кэш по умолчанию свой у каждого процесса: страницы кэшируются '
+        f'только на {settings.PAGE_LOCAL_CACHE_TIMEOUT} с.',
+        hint='Для долгого кэша страниц нужен общий кэш, например Redis '
+             'или Memcached.',
+        id='posts.W001',
+    )]
+
+
+def cache_page_versioned(timeout, scopes, validators=None):
+    """cache_page с ключом, зависящим от версий областей страницы.
+
+    Кэшируются только страницы для анонимных посетителей: страницы
+    пользователей собираются каждый раз, но тоже получают ETag.
+
+    scopes получает именованные аргументы view и возвращает список
+    областей. Сигналы моделей повышают версии областей, так что
+    изменённые страницы сразу пересобираются, а timeout может быть
+    большим, если кэш общий для процессов (см. page_timeout).
+
+    validators, если заданы, тоже получают аргументы view и одним
+    запросом возвращают (время последнего изменения, состояние данных).
+    Из них и версий областей собираются ETag и Last-Modified, и
+    совпавший условный GET получает 304 без рендеринга страницы.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            names = [SITE_SCOPE, *scopes(**kwargs)]
+            versions = scope_versions(names)
+            raw = ';'.join(
+                f'{name}={version}'
+                for name, version in zip(names, versions)
+            )
+            if request.user.is_authenticated:
+                # В странице имя пользователя, кнопки подписки и его
+                # CSRF-токен, поэтому в общий кэш она не попадает.
+                cached_view = view_func
+            else:
+                key_prefix = hashlib.md5(raw.encode()).hexdigest()
+                rendered = []
+
+                def render(*args, **kwargs):
+                    rendered.append(True)
+                    return view_func(*args, **kwargs)
+
+                cached_view = counted(
+                    cache_page(page_timeout(timeout), key_prefix=key_prefix)(
+                        render
+                    ),
+                    rendered,
+                )
+            if validators is None or request.method not in ('GET', 'HEAD'):
+                return cached_view(request, *args, **kwargs)
+            changed, state = validators(**kwargs)
+            last_modified = version_time(versions)
+            if changed is not None:
+                last_modified = max(last_modified, changed)
+            timestamp = int(last_modified.timestamp())
+            # Страница зависит от пользователя: шапка, подписка, форма.
+            viewer = request.user.pk if request.user.is_authenticated else ''
+            etag = 'W/' + quote_etag(hashlib.md5(
+                f'{raw};{state};{viewer}'.encode()
+            ).hexdigest())
+            response = get_conditional_response(
+                request, etag=etag, last_modified=timestamp
+            )
+            if response is None:
+                response = cached_view(request, *args, **kwargs)
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(timestamp)
+            patch_page_cache_control(request, response)
+            return response
+        return _wrapped_view
+    return decorator
+
+
+def counted(cached_view, rendered):
+    """Считает попадания в кэш страниц: промах — это вызов самой view."""
+    def wrapper(request, *args, **kwargs):
+        response = cached_view(request, *args, **kwargs)
+        if request.method in ('GET', 'HEAD'):
+            PAGE_CACHE.inc(
+                view=view_name(request),
+                result='miss' if rendered else 'hit',
+            )
+        return response
+    return wrapper
+
+
+def patch_page_cache_control(request, response):
+    """Страницы хранит только браузер и проверяет их по ETag.
+
+    Expires и max-age из cache_page рассчитаны на кэш сервера, а
+    анонимным посетителям страница отдаётся на settings.PAGE_MAX_AGE
+    секунд. Общим кэшам страницы не отдаются: private убирает риск, что
+    прокси раздаст чужую страницу.
+    """
+    del response['Expires']
+    max_age = 0 if request.user.is_authenticated else settings.PAGE_MAX_AGE
+    patch_cache_control(
+        response, private=True, max_age=max_age, must_revalidate=True
+    )
+    patch_vary_headers(response, ('Cookie',))
+
+
+def index_scopes():
+    return ['index']
+
+
+def group_scopes(slug):
+    return [f'group:{slug}']
+
+
+def profile_scopes(username):
+    return [f'profile:{username}']
+
+
+def post_scopes(post_id):
+    # На странице поста выводятся данные автора, например число его постов.
+    username = Post.objects.filter(pk=post_id).values_list(
+        'author__username', flat=True
+    ).first()
+    scopes = [f'post:{post_id}']
+    if username is not None:
+        scopes.append(f'profile:{username}')
+    return scopes
+
+
+def _feed_validators(posts):
+    latest = posts.aggregate(changed=Max('pub_date'), last=Max('pk'))
+    return latest['changed'], latest['last']
+
+
+def index_validators():
+    return _feed_validators(Post.objects.all())
+
+
+def group_validators(slug):
+    return _feed_validators(Post.objects.filter(group__slug=slug))
+
+
+def profile_validators(username):
+    return _feed_validators(Post.objects.filter(author__username=username))
+
+
+def post_validators(post_id):
+    latest = Post.objects.filter(pk=post_id).aggregate(
+        modified=Max('modified'),
+        commented=Max('comments__created'),
+        comment=Max('comments__pk'),
+    )
+    changed = max(
+        filter(None, (latest['modified'], latest['commented'])),
+        default=None,
+    )
+    return changed, (latest['modified'], latest['comment'])
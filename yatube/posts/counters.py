@@ -0,0 +1,103 @@
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import Comment, Follow, GroupStats, Post, UserStats
+
+# Счётчик: (модель, поле-ссылка на владельца счётчика).
+USER_COUNTERS = {
+    'posts': (Post, 'author'),
+    'comments': (Comment, 'author'),
+    'followers': (Follow, 'author'),
+    'following': (Follow, 'user'),
+}
+GROUP_COUNTERS = {
+    'posts': (Post, 'group'),
+}
+
+
+def change_user_stats(user_id, **deltas):
+    _change(UserStats, user_id, deltas, reconcile_users)
+
+
+def change_group_stats(group_id, **deltas):
+    _change(GroupStats, group_id, deltas, reconcile_groups)
+
+
+def _change(model, pk, deltas, reconcile):
+    """Сдвигает счётчики одним UPDATE; недостающую строку пересчитывает.
+
+    При уменьшении строку не создаём: её владелец может удаляться
+    каскадом в этой же транзакции.
+    """
+    changes = {
+        field: F(field) + delta if delta > 0 else Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items()
+    }
+    with transaction.atomic():
+        updated = model.objects.filter(pk=pk).update(**changes)
+        if not updated and any(delta > 0 for delta in deltas.values()):
+            reconcile([pk])
+
+
+def user_stats(user):
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        reconcile_users([user.pk])
+        return UserStats.objects.get(pk=user.pk)
+
+
+def group_stats(group):
+    try:
+        return group.stats
+    except GroupStats.DoesNotExist:
+        reconcile_groups([group.pk])
+        return GroupStats.objects.get(pk=group.pk)
+
+
+def reconcile_users(user_ids):
+    return _reconcile(UserStats, 'user_id', USER_COUNTERS, user_ids)
+
+
+def reconcile_groups(group_ids):
+    return _reconcile(GroupStats, 'group_id', GROUP_COUNTERS, group_ids)
+
+
+def _reconcile(model, key, counters, ids):
+    """Пересчитывает счётчики пачки владельцев по данным.
+
+    Возвращает число созданных и исправленных строк.
+    """
+    ids = list(ids)
+    totals = {
+        field: _totals(source, owner, ids)
+        for field, (source, owner) in counters.items()
+    }
+    actual = [
+        model(**{key: pk}, **{
+            field: totals[field].get(pk, 0) for field in counters
+        })
+        for pk in ids
+    ]
+    stored = model.objects.in_bulk(ids)
+    missing = [stats for stats in actual if stats.pk not in stored]
+    drifted = [
+        stats for stats in actual
+        if stats.pk in stored and any(
+            getattr(stats, field) != getattr(stored[stats.pk], field)
+            for field in counters
+        )
+    ]
+    with transaction.atomic():
+        model.objects.bulk_create(missing, ignore_conflicts=True)
+        model.objects.bulk_update(drifted, list(counters))
+    return len(missing) + len(drifted)
+
+
+def _totals(model, owner, ids):
+    return dict(
+        model.objects.filter(**{f'{owner}__in': ids}).order_by().values(
+            owner
+        ).annotate(total=Count('pk')).values_list(owner, 'total')
+    )
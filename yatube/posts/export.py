@@ -0,0 +1,152 @@
+import json
+import zipfile
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Comment, Follow, Post
+from .storage import post_image_storage
+
+EXPORT_CHUNK_SIZE = 2000
+# Сколько байт копить перед отправкой очередного куска ответа.
+EXPORT_BUFFER_SIZE = 64 * 1024
+
+
+def export_records(user):
+    """Данные пользователя по одной записи: (тип, словарь).
+
+    Записи совпадают по полям с форматом import_content. Querysets
+    читаются через .iterator(), так что память не растёт с их размером.
+    """
+    posts = Post.objects.filter(author=user).order_by('pk').values_list(
+        'pk', 'group__slug', 'text', 'pub_date', 'image'
+    )
+    for pk, group, text, pub_date, image in posts.iterator(
+        chunk_size=EXPORT_CHUNK_SIZE
+    ):
+        yield 'post', {
+            'id': pk,
+            'author': user.username,
+            'group': group,
+            'text': text,
+            'pub_date': pub_date,
+            'image': image or None,
+        }
+    comments = Comment.objects.filter(author=user).order_by(
+        'pk'
+    ).values_list('pk', 'post_id', 'text', 'created')
+    for pk, post_id, text, created in comments.iterator(
+        chunk_size=EXPORT_CHUNK_SIZE
+    ):
+        yield 'comment', {
+            'id': pk,
+            'post': post_id,
+            'author': user.username,
+            'text': text,
+            'created': created,
+        }
+    follows = Follow.objects.filter(user=user).order_by('pk').values_list(
+        'author__username', flat=True
+    )
+    for author in follows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield 'follow', {'user': user.username, 'author': author}
+
+
+def _line(record):
+    return json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def _buffered(parts):
+    buffer, size = [], 0
+    for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if size >= EXPORT_BUFFER_SIZE:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def export_jsonl(user):
+    """Все данные одним JSONL; тип записи — в поле type."""
+    return _buffered(
+        (_line({'type': kind, **record}) + '\n').encode()
+        for kind, record in export_records(user)
+    )
+
+
+class _Pipe:
+    """Файл для zipfile, из которого генератор забирает записанное."""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    @property
+    def full(self):
+        return self.size >= EXPORT_BUFFER_SIZE
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks, self.size = [], 0
+        return data
+
+
+def export_zip(user):
+    """ZIP с posts/comments/follows.jsonl и картинками постов.
+
+    Архив пишется потоком без перемотки, файлы JSONL — в формате
+    import_content, картинки — в images/ под своими именами.
+    """
+    return (chunk for chunk in _zip_chunks(user) if chunk)
+
+
+def _zip_chunks(user):
+    pipe = _Pipe()
+    with zipfile.ZipFile(pipe, 'w', zipfile.ZIP_DEFLATED) as archive:
+        names = {
+            'post': 'posts.jsonl',
+            'comment': 'comments.jsonl',
+            'follow': 'follows.jsonl',
+        }
+        current, entry = None, None
+        for kind, record in export_records(user):
+            if kind != current:
+                if entry is not None:
+                    entry.close()
+                current = kind
+                entry = archive.open(names[kind], 'w', force_zip64=True)
+            entry.write((_line(record) + '\n').encode())
+            if pipe.full:
+                yield pipe.take()
+        if entry is not None:
+            entry.close()
+        images = Post.objects.filter(author=user).exclude(image='').order_by(
+            'image'
+        ).values_list('image', flat=True).distinct()
+        for name in images.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield from _copy_image(archive, pipe, name)
+    yield pipe.take()
+
+
+def _copy_image(archive, pipe, name):
+    try:
+        source = post_image_storage.open(name, 'rb')
+    except OSError:
+        # Файл пропал с диска: в архиве остаётся только запись поста.
+        return
+    with source, archive.open(
+        f'images/{name}', 'w', force_zip64=True
+    ) as entry:
+        for chunk in source.chunks(EXPORT_BUFFER_SIZE):
+            entry.write(chunk)
+            if pipe.full:
+                yield pipe.take()
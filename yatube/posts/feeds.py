@@ -0,0 +1,197 @@
+import heapq
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Follow, Post, TimelineEntry, UserStats
+from .utils import NUMBER_OF_POSTS_ON_PAGE, KeysetPaginator
+
+TIMELINE_BATCH_SIZE = 1000
+
+
+class TimelinePaginator(KeysetPaginator):
+    """Лента подписок по гибридной схеме push/pull.
+
+    Посты обычных авторов читаются срезом материализованной таблицы
+    TimelineEntry. Посты авторов, у которых подписчиков стало больше
+    settings.FEED_FANOUT_THRESHOLD (UserStats.pulled), в таблицу не
+    раскладываются: они подмешиваются при чтении k-way слиянием срезов
+    по (pub_date, id) из постов каждого такого автора.
+    """
+
+    def __init__(self, user, per_page):
+        entries = TimelineEntry.objects.filter(user=user).select_related(
+            'post__author', 'post__group'
+        )
+        super().__init__(entries, per_page, ordering=('-pub_date', '-post_id'))
+        self.pulled_authors = list(pulled_authors(user))
+
+    def _fetch(self, limit, offset=0, key=None, after=True):
+        sources = [
+            [self._entry_post(entry) for entry in super()._fetch(
+                offset + limit, key=key, after=after)]
+        ]
+        for author_id in self.pulled_authors:
+            posts = self._author_posts(author_id).order_by(*(
+                ('-pub_date', '-pk') if after else ('pub_date', 'pk')
+            ))
+            if key is not None:
+                # Ключ записи ленты совпадает с (pub_date, pk) поста.
+                posts = posts.filter(self._keyset_filter(
+                    key, after, fields=('pub_date', 'pk')))
+            sources.append(list(posts[:offset + limit]))
+        rows, seen = [], set()
+        for post in heapq.merge(*sources, key=self._key, reverse=after):
+            # Посты автора, ставшего популярным, могли остаться в ленте.
+            pk = self._key(post)[1]
+            if pk not in seen:
+                seen.add(pk)
+                rows.append(post)
+        return rows[offset:offset + limit]
+
+    def _entry_post(self, entry):
+        return entry.post
+
+    def _author_posts(self, author_id):
+        return Post.objects.filter(author_id=author_id).select_related(
+            'author', 'group'
+        )
+
+    def _key(self, row):
+        return row.pub_date, row.pk
+
+
+class TimelineKeysPaginator(TimelinePaginator):
+    """Та же лента, но строками (pub_date, id) поста без моделей."""
+
+    def __init__(self, user, per_page):
+        super().__init__(user, per_page)
+        self.object_list = TimelineEntry.objects.filter(
+            user=user
+        ).values_list('pub_date', 'post_id')
+
+    def _entry_post(self, entry):
+        return entry
+
+    def _author_posts(self, author_id):
+        return Post.objects.filter(author_id=author_id).values_list(
+            'pub_date', 'pk'
+        )
+
+    def _key(self, row):
+        return row
+
+
+def timeline_page(request):
+    paginator = TimelinePaginator(request.user, NUMBER_OF_POSTS_ON_PAGE)
+    return paginator.get_page(
+        request.GET.get("page"), request.GET.get("cursor")
+    )
+
+
+def is_pulled(author_id):
+    return UserStats.objects.filter(pk=author_id, pulled=True).exists()
+
+
+def pulled_authors(user):
+    """Авторы из подписок пользователя, чьи посты читаются при чтении."""
+    return Follow.objects.filter(
+        user=user, author__stats__pulled=True
+    ).values_list('author_id', flat=True)
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_pulled(post.author_id):
+        return
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        'user_id', flat=True
+    )
+    _insert(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id in followers.iterator()
+    )
+
+
+def backfill_timeline(user_id, author_id):
+    """Добавляет в ленту пользователя уже опубликованные посты автора.
+
+    Вызывается после того, как сигнал учёл подписку в счётчике: автор,
+    у которого подписчиков стало больше порога, с этого момента
+    читается при чтении ленты. Обратно под порог он не возвращается,
+    чтобы отписка не дозаполняла ленты всех оставшихся подписчиков.
+    """
+    UserStats.objects.filter(
+        pk=author_id, pulled=False,
+        followers__gt=settings.FEED_FANOUT_THRESHOLD,
+    ).update(pulled=True)
+    if not is_pulled(author_id):
+        _backfill(user_id, author_id)
+
+
+def prune_timeline(user_id, author_id):
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def _backfill(user_id, author_id):
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date'
+    )
+    _insert(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for post_id, pub_date in posts.iterator()
+    )
+
+
+def rebuild_timelines():
+    """Заново раскладывает все посты по лентам одним INSERT ... SELECT.
+
+    Нужна после массовой загрузки, когда сигналы не срабатывали, и чтобы
+    вернуть в раскладку авторов, снова ставших непопулярными. Флаги
+    pulled выставляются по счётчикам подписчиков, так что счётчики
+    должны быть пересчитаны до вызова.
+    """
+    threshold = settings.FEED_FANOUT_THRESHOLD
+    tables = {
+        'timeline': TimelineEntry._meta.db_table,
+        'follow': Follow._meta.db_table,
+        'post': Post._meta.db_table,
+        'stats': UserStats._meta.db_table,
+    }
+    with transaction.atomic():
+        UserStats.objects.filter(followers__gt=threshold).update(pulled=True)
+        UserStats.objects.filter(followers__lte=threshold).update(
+            pulled=False
+        )
+        TimelineEntry.objects.all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO {timeline} (user_id, post_id, author_id, '
+                'pub_date) '
+                'SELECT f.user_id, p.id, p.author_id, p.pub_date '
+                'FROM {follow} f JOIN {post} p ON p.author_id = f.author_id '
+                'WHERE f.author_id NOT IN (SELECT user_id FROM {stats} '
+                'WHERE pulled = %s)'.format(**tables),
+                [True],
+            )
+
+
+def _insert(entries):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) == TIMELINE_BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
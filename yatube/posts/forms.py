@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from .images import normalize_image
 from .models import Comment, Post
 
 
@@ -29,6 +31,12 @@ class PostForm(forms.ModelForm):
                 )
         return data
 
+    def clean_image(self):
+        data = self.cleaned_data["image"]
+        if isinstance(data, UploadedFile):
+            return normalize_image(data)
+        return data
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,72 @@
+import io
+import os
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps
+
+# Форматы, в которых картинка пересохраняется без смены расширения.
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 85, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'GIF': {},
+    'WEBP': {'quality': 85},
+}
+# Что из image.info сохраняется в файл: прозрачность и цветовой профиль
+# нужны для показа, а EXIF, текстовые блоки PNG и прочее — выбрасываются.
+KEPT_INFO = ('transparency', 'icc_profile')
+
+
+def normalize_image(upload):
+    """Приводит загруженную картинку к виду, в котором она хранится.
+
+    Размер проверяется по заголовку до распаковки пикселей. Картинка
+    поворачивается по EXIF, уменьшается до settings.IMAGE_MAX_SIDE по
+    большей стороне и пересохраняется без метаданных, так что миниатюры
+    потом никогда не распаковывают многомегапиксельный оригинал.
+    От анимированных картинок остаётся первый кадр. Битый или обрезанный
+    файл, который ImageField пропускает без распаковки пикселей, даёт
+    ValidationError, а не ошибку сервера.
+    """
+    try:
+        return _normalize(upload)
+    except (OSError, ValueError, Image.DecompressionBombError) as error:
+        raise ValidationError(
+            'Не удалось прочитать картинку: файл повреждён'
+        ) from error
+
+
+def _normalize(upload):
+    upload.seek(0)
+    image = Image.open(upload)
+    width, height = image.size
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            f'Картинка больше {settings.IMAGE_MAX_PIXELS} пикселей'
+        )
+    source_format = image.format
+    image_format = (
+        source_format if source_format in SAVE_OPTIONS else 'JPEG'
+    )
+    max_side = settings.IMAGE_MAX_SIDE
+    if image_format == 'JPEG':
+        # JPEG сразу распаковывается в уменьшенном в 2–8 раз масштабе.
+        image.draft('RGB', (max_side, max_side))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    # exif_transpose оставляет EXIF в image.info, а писатель PNG
+    # сохраняет его оттуда вместе с GPS и моделью камеры.
+    image.info = {
+        key: value for key, value in image.info.items() if key in KEPT_INFO
+    }
+    output = io.BytesIO()
+    image.save(output, image_format, **SAVE_OPTIONS[image_format])
+    name = upload.name
+    if image_format != source_format:
+        name = os.path.splitext(name)[0] + '.jpg'
+    return SimpleUploadedFile(
+        name, output.getvalue(), Image.MIME[image_format]
+    )
@@ -0,0 +1,329 @@
+import csv
+import json
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .caching import SITE_SCOPE, bump
+from .counters import reconcile_groups, reconcile_users
+from .feeds import rebuild_timelines
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+IMPORT_BATCH_SIZE = 5000
+# Сколько ошибок в строках выводить, остальные только считаются.
+IMPORT_ERRORS_SHOWN = 20
+
+
+class ImportStats:
+    """Сколько строк загружено, уже было в базе и пропущено с ошибкой."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.imported = 0
+        self.duplicates = 0
+        self.skipped = 0
+        self.errors = []
+
+    def skip(self, line, message):
+        self.skipped += 1
+        if len(self.errors) < IMPORT_ERRORS_SHOWN:
+            self.errors.append(f'{line}: {message}')
+
+    @property
+    def rate(self):
+        elapsed = time.monotonic() - self.started
+        return self.imported / elapsed if elapsed else 0.0
+
+
+class Touched:
+    """Чьи счётчики и ленты надо досчитать после загрузки."""
+
+    def __init__(self):
+        self.users = set()
+        self.groups = set()
+        self.authors = set()
+
+
+def read_records(stream, file_format):
+    """Записи файла по одной: (номер строки, словарь).
+
+    Пустые значения CSV становятся None, как отсутствующие ключи JSONL.
+    Вместо словаря нечитаемой строки JSONL отдаётся ValueError, чтобы
+    load() пропустил её вместе с остальными ошибками.
+    """
+    if file_format == 'csv':
+        for line, row in enumerate(csv.DictReader(stream), start=2):
+            yield line, {
+                key: value if value != '' else None
+                for key, value in row.items()
+            }
+        return
+    for line, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+        except ValueError as error:
+            yield line, ValueError(f'некорректный JSON: {error}')
+            continue
+        if not isinstance(row, dict):
+            yield line, ValueError('строка не является объектом JSON')
+            continue
+        yield line, row
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def parse_date(value):
+    if not value:
+        return timezone.now()
+    date = parse_datetime(value)
+    if date is None:
+        raise ValueError(f'Некорректная дата {value!r}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def lookup(model, field, values, create=False):
+    """Значения поля -> id одним запросом на пачку.
+
+    С create=True недостающие объекты создаются: пользователи без
+    пароля, группы с заголовком из slug.
+    """
+    values = {value for value in values if value}
+    found = dict(
+        model.objects.filter(**{f'{field}__in': values}).values_list(
+            field, 'pk'
+        )
+    )
+    missing = values - found.keys()
+    if create and missing:
+        model.objects.bulk_create(
+            [_new(model, field, value) for value in missing],
+            ignore_conflicts=True,
+        )
+        found.update(
+            model.objects.filter(**{f'{field}__in': missing}).values_list(
+                field, 'pk'
+            )
+        )
+    return found
+
+
+def _new(model, field, value):
+    if model is Group:
+        return Group(slug=value, title=value, description='')
+    user = model(**{field: value})
+    user.set_unusable_password()
+    return user
+
+
+def _get(ids, value, what):
+    pk = ids.get(value) if value else None
+    if pk is None:
+        raise ValueError(f'нет {what} {value!r}')
+    return pk
+
+
+def _text(row):
+    if not row.get('text'):
+        raise ValueError('пустой текст')
+    return row['text']
+
+
+def prepare_posts(chunk, touched, create):
+    """Функция, собирающая Post из строки; ссылки ищутся на всю пачку."""
+    authors = lookup(
+        User, 'username', (row.get('author') for _, row in chunk), create
+    )
+    groups = lookup(
+        Group, 'slug', (row.get('group') for _, row in chunk), create
+    )
+
+    def make(row):
+        author_id = _get(authors, row.get('author'), 'автора')
+        group_id = None
+        if row.get('group'):
+            group_id = _get(groups, row['group'], 'группы')
+        date = parse_date(row.get('pub_date'))
+        post = Post(
+            pk=row.get('id'),
+            text=_text(row),
+            author_id=author_id,
+            group_id=group_id,
+            image=row.get('image') or '',
+            pub_date=date,
+            modified=date,
+        )
+        touched.users.add(author_id)
+        touched.authors.add(author_id)
+        if group_id is not None:
+            touched.groups.add(group_id)
+        return post
+    return make
+
+
+def prepare_comments(chunk, touched, create):
+    authors = lookup(
+        User, 'username', (row.get('author') for _, row in chunk), create
+    )
+    posts = Post.objects.filter(
+        pk__in={str(row.get('post')) for _, row in chunk if row.get('post')}
+    ).values_list('pk', flat=True)
+    posts = {str(pk): pk for pk in posts}
+
+    def make(row):
+        comment = Comment(
+            pk=row.get('id'),
+            post_id=_get(posts, str(row.get('post') or ''), 'поста'),
+            author_id=_get(authors, row.get('author'), 'автора'),
+            text=_text(row),
+            created=parse_date(row.get('created')),
+        )
+        touched.users.add(comment.author_id)
+        return comment
+    return make
+
+
+def prepare_follows(chunk, touched, create):
+    users = lookup(
+        User, 'username',
+        (row.get(key) for _, row in chunk for key in ('user', 'author')),
+        create,
+    )
+
+    def make(row):
+        user_id = _get(users, row.get('user'), 'пользователя')
+        author_id = _get(users, row.get('author'), 'автора')
+        if user_id == author_id:
+            raise ValueError('подписка на самого себя')
+        touched.users.update((user_id, author_id))
+        touched.authors.add(author_id)
+        return Follow(user_id=user_id, author_id=author_id)
+    return make
+
+
+KINDS = {
+    'post': (Post, prepare_posts),
+    'comment': (Comment, prepare_comments),
+    'follow': (Follow, prepare_follows),
+}
+
+
+@contextmanager
+def preserved_dates():
+    """Отключает auto_now/auto_now_add, чтобы сохранить даты из файла."""
+    fields = [
+        field
+        for model in (Post, Comment)
+        for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    ]
+    flags = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, flags):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def existing(model, objects):
+    """Сколько объектов пачки уже есть в базе.
+
+    Подписки ищутся по паре (user_id, author_id), посты и комментарии —
+    по явным id; объекты без id конфликтовать не могут.
+    """
+    if model is Follow:
+        pairs = {(obj.user_id, obj.author_id) for obj in objects}
+        found = Follow.objects.filter(
+            user_id__in={user_id for user_id, _ in pairs},
+            author_id__in={author_id for _, author_id in pairs},
+        ).values_list('user_id', 'author_id')
+        return len(pairs.intersection(found))
+    pks = {obj.pk for obj in objects if obj.pk is not None}
+    if not pks:
+        return 0
+    return model.objects.filter(pk__in=pks).count()
+
+
+def load(records, kind, batch_size=IMPORT_BATCH_SIZE, create=False,
+         progress=None):
+    """Загружает записи пачками по batch_size, по транзакции на пачку.
+
+    Записи читаются потоком, так что в памяти одновременно только одна
+    пачка. Сигналы при bulk_create не срабатывают: миниатюры, ленты и
+    счётчики не трогаются, их досчитывает finalize().
+    """
+    model, prepare = KINDS[kind]
+    stats = ImportStats()
+    touched = Touched()
+    with preserved_dates():
+        for chunk in chunks(records, batch_size):
+            rows = []
+            for line, row in chunk:
+                if isinstance(row, ValueError):
+                    stats.skip(line, str(row))
+                else:
+                    rows.append((line, row))
+            with transaction.atomic():
+                make = prepare(rows, touched, create)
+                objects = []
+                for line, row in rows:
+                    try:
+                        objects.append(make(row))
+                    except (ValueError, TypeError) as error:
+                        stats.skip(line, str(error))
+                # ignore_conflicts молча пропускает уже загруженные
+                # строки, поэтому вставленные считаются по ключам пачки.
+                keyless = 0 if model is Follow else sum(
+                    obj.pk is None for obj in objects
+                )
+                before = existing(model, objects)
+                model.objects.bulk_create(objects, ignore_conflicts=True)
+                inserted = existing(model, objects) - before + keyless
+            stats.imported += inserted
+            stats.duplicates += len(objects) - inserted
+            if progress is not None:
+                progress(stats)
+    return stats, touched
+
+
+def finalize(touched, batch_size=IMPORT_BATCH_SIZE):
+    """Досчитывает то, что при загрузке делали бы сигналы.
+
+    Ленты пересобираются одним INSERT ... SELECT после пересчёта
+    счётчиков, по которым rebuild_timelines решает, чьи посты
+    раскладывать.
+    """
+    for reconcile, ids in ((reconcile_users, touched.users),
+                           (reconcile_groups, touched.groups)):
+        for batch in chunks(sorted(ids), batch_size):
+            reconcile(batch)
+    if touched.authors:
+        rebuild_timelines()
+    # Явные id из файла не сдвигают последовательности PostgreSQL.
+    sql = connection.ops.sequence_reset_sql(no_style(), [Post, Comment])
+    if sql:
+        with connection.cursor() as cursor:
+            for statement in sql:
+                cursor.execute(statement)
+    bump(SITE_SCOPE)
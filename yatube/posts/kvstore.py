@@ -0,0 +1,102 @@
+import threading
+from contextlib import contextmanager
+
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .thumbnails import THUMBNAIL_VARIANTS
+
+EMPTY_VALUE = cached_db_kvstore.EMPTY_VALUE
+
+_local = threading.local()
+
+
+class KVStore(cached_db_kvstore.KVStore):
+    """KV-хранилище sorl, которое сначала смотрит в предзагруженные ключи.
+
+    Внутри preloaded_thumbnails() тег {% thumbnail %} не ходит ни в кэш,
+    ни в БД за миниатюрами, собранными одним пакетным запросом.
+    """
+
+    def _get_raw(self, key):
+        preloaded = getattr(_local, 'values', None)
+        if preloaded is not None and key in preloaded:
+            value = preloaded[key]
+            return None if value == EMPTY_VALUE else value
+        return super()._get_raw(key)
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        preloaded = getattr(_local, 'values', None)
+        if preloaded is not None:
+            preloaded[key] = value
+
+    def _delete_raw(self, *keys):
+        super()._delete_raw(*keys)
+        preloaded = getattr(_local, 'values', None)
+        if preloaded is not None:
+            for key in keys:
+                preloaded.pop(key, None)
+
+
+def thumbnail_key(file_, geometry, options):
+    """Ключ миниатюры в KV-хранилище, как его строит ThumbnailBackend."""
+    backend = default.backend
+    source = ImageFile(file_)
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return add_prefix(ImageFile(name, default.storage).key)
+
+
+def load_thumbnails(images, variants=THUMBNAIL_VARIANTS, known=()):
+    """Сырые значения KV-хранилища для всех пар картинка/размер.
+
+    Один get_many по кэшу и один запрос в БД для промахов; ключи из
+    known уже загружены и пропускаются.
+    """
+    keys = {
+        thumbnail_key(image, geometry, options)
+        for image in images if image
+        for geometry, options in variants
+    }.difference(known)
+    if not keys:
+        return {}
+    kvstore = default.kvstore
+    values = kvstore.cache.get_many(keys)
+    missing = keys.difference(values)
+    if missing:
+        found = dict(
+            KVStoreModel.objects.filter(key__in=missing).values_list(
+                'key', 'value'
+            )
+        )
+        loaded = {key: found.get(key, EMPTY_VALUE) for key in missing}
+        kvstore.cache.set_many(loaded, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(loaded)
+    return values
+
+
+@contextmanager
+def preloaded_thumbnails(images, variants=THUMBNAIL_VARIANTS):
+    previous = getattr(_local, 'values', None)
+    # Вложенная предзагрузка дополняет уже загруженные значения.
+    values = {} if previous is None else previous
+    values.update(load_thumbnails(images, variants, known=values))
+    _local.values = values
+    try:
+        yield
+    finally:
+        _local.values = previous
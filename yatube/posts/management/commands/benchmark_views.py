@@ -0,0 +1,91 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import (setup_databases, setup_test_environment,
+                               teardown_databases, teardown_test_environment)
+
+from posts.benchmark import (BENCHMARK_REPEAT, BENCHMARK_SIZES,
+                             SIZE_TOLERANCE, TIME_TOLERANCE, regressions, run)
+
+CURRENT = 'current'
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет p50/p95, число запросов, строк и байт основных view '
+        'на базах seed_data разного размера и сверяет с baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', default=['small'],
+            choices=[*BENCHMARK_SIZES, CURRENT],
+            help=f'Размеры тестовых баз; {CURRENT} — текущая база как есть.',
+        )
+        parser.add_argument('--views', nargs='+', help='Только эти view.')
+        parser.add_argument('--repeat', type=int, default=BENCHMARK_REPEAT)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Куда сохранить результаты.')
+        parser.add_argument(
+            '--baseline', help='JSON прошлого запуска для сравнения.',
+        )
+        parser.add_argument(
+            '--time-tolerance', type=float, default=TIME_TOLERANCE,
+        )
+        parser.add_argument(
+            '--size-tolerance', type=float, default=SIZE_TOLERANCE,
+        )
+
+    def handle(self, *args, **options):
+        results = {}
+        setup_test_environment()
+        try:
+            for size in options['sizes']:
+                results[size] = self.run_size(size, options)
+                self.report(size, results[size])
+        finally:
+            teardown_test_environment()
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(results, file, indent=2, sort_keys=True)
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)
+            found = regressions(
+                results, baseline,
+                options['time_tolerance'], options['size_tolerance'],
+            )
+            if found:
+                raise CommandError('Хуже baseline:\n' + '\n'.join(found))
+            self.stdout.write('Регрессий относительно baseline нет')
+
+    def run_size(self, size, options):
+        if size == CURRENT:
+            # Посты и комментарии из замеров в рабочей базе не остаются.
+            with transaction.atomic():
+                results = run(options['repeat'], options['views'])
+                transaction.set_rollback(True)
+            return results
+        # Каждый размер собирается в отдельной тестовой базе.
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            call_command(
+                'seed_data', seed=options['seed'], stdout=StringIO(),
+                **BENCHMARK_SIZES[size],
+            )
+            return run(options['repeat'], options['views'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+    def report(self, size, views):
+        self.stdout.write(f'{size}:')
+        for view, stats in views.items():
+            self.stdout.write(
+                f'  {view:<14} p50 {stats["p50_ms"]:>8} мс  '
+                f'p95 {stats["p95_ms"]:>8} мс  '
+                f'запросов {stats["queries"]:>3}  строк {stats["rows"]:>5}  '
+                f'байт {stats["bytes"]:>7}'
+            )
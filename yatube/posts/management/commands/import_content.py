@@ -0,0 +1,62 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.importing import (IMPORT_BATCH_SIZE, KINDS, finalize, load,
+                             read_records)
+from posts.search import suspended_search_triggers
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает посты, комментарии или подписки из JSONL или CSV '
+        'пачками через bulk_create.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(KINDS))
+        parser.add_argument('path', help='Файл .jsonl или .csv.')
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'),
+            help='Формат файла; по умолчанию — по расширению.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+            help='Сколько строк вставлять одной транзакцией.',
+        )
+        parser.add_argument(
+            '--create-missing', action='store_true',
+            help='Создавать неизвестных пользователей и группы.',
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        path = options['path']
+        file_format = options['format'] or (
+            'csv' if path.endswith('.csv') else 'jsonl'
+        )
+        if not os.path.exists(path):
+            raise CommandError(f'Нет файла {path}')
+        with open(path, encoding='utf-8', newline='') as stream:
+            with suspended_search_triggers():
+                stats, touched = load(
+                    read_records(stream, file_format),
+                    options['kind'],
+                    batch_size=options['batch_size'],
+                    create=options['create_missing'],
+                    progress=self.progress,
+                )
+        for error in stats.errors:
+            self.stderr.write(error)
+        finalize(touched, options['batch_size'])
+        self.stdout.write(
+            f'Загружено: {stats.imported}, уже были: {stats.duplicates}, '
+            f'пропущено: {stats.skipped}, '
+            f'{stats.rate:.0f} строк/с'
+        )
+
+    def progress(self, stats):
+        if self.verbosity > 1:
+            self.stdout.write(
+                f'{stats.imported} строк, {stats.rate:.0f} строк/с'
+            )
@@ -0,0 +1,50 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate_thumbnails, make_executor
+
+
+def _generate(name):
+    try:
+        generate_thumbnails(name)
+    except Exception as error:
+        return name, str(error)
+    return name, None
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры картинок всех постов в нескольких процессах.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов; 0 — в текущем процессе.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=20,
+            help='Сколько картинок передавать процессу за раз.',
+        )
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').values_list(
+            'image', flat=True
+        ).distinct().iterator()
+        if options['workers']:
+            with make_executor(options['workers']) as executor:
+                self.report(executor.map(
+                    _generate, names, chunksize=options['chunk_size']
+                ))
+        else:
+            self.report(map(_generate, names))
+
+    def report(self, results):
+        done = failed = 0
+        for name, error in results:
+            if error is None:
+                done += 1
+            else:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+        self.stdout.write(f'Готово: {done}, с ошибками: {failed}')
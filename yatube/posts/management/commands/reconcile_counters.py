@@ -0,0 +1,38 @@
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts.counters import reconcile_groups, reconcile_users
+from posts.models import Group
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики пользователей и групп и чинит расхождения.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько владельцев счётчиков пересчитывать за раз.',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        users = self.reconcile(User, reconcile_users, batch_size)
+        groups = self.reconcile(Group, reconcile_groups, batch_size)
+        self.stdout.write(
+            f'Исправлено счётчиков пользователей: {users}, групп: {groups}'
+        )
+
+    def reconcile(self, model, reconcile, batch_size):
+        ids = model.objects.order_by('pk').values_list(
+            'pk', flat=True
+        ).iterator()
+        fixed = 0
+        while True:
+            batch = list(islice(ids, batch_size))
+            if not batch:
+                return fixed
+            fixed += reconcile(batch)
@@ -0,0 +1,98 @@
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from posts.caching import SITE_SCOPE, bump
+from posts.feeds import rebuild_timelines
+from posts.search import suspended_search_triggers
+from posts.seeding import SEED_BATCH_SIZE, Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу воспроизводимыми данными со степенным '
+        'распределением авторов, групп и комментариев.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=10_000)
+        parser.add_argument('--comments', type=int, default=20_000)
+        parser.add_argument('--follows', type=int, default=5000)
+        parser.add_argument(
+            '--author-exponent', type=float, default=1.2,
+            help='Показатель степени для авторов постов и подписок.',
+        )
+        parser.add_argument(
+            '--group-exponent', type=float, default=1.1,
+            help='Показатель степени для групп постов.',
+        )
+        parser.add_argument(
+            '--post-exponent', type=float, default=1.0,
+            help='Показатель степени для постов, которые комментируют.',
+        )
+        parser.add_argument(
+            '--no-group-share', type=float, default=0.3,
+            help='Доля постов без группы.',
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней до SEED_EPOCH разбросаны даты.',
+        )
+        parser.add_argument(
+            '--no-timelines', action='store_true',
+            help=(
+                'Не раскладывать посты по лентам подписок: при тысячах '
+                'подписчиков у авторов это самый долгий шаг.'
+            ),
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=SEED_BATCH_SIZE,
+            help='Сколько строк вставлять одной транзакцией.',
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        started = time.monotonic()
+        seeder = Seeder(
+            options['seed'], options['batch_size'], progress=self.progress
+        )
+        with suspended_search_triggers():
+            users = seeder.users(options['users'])
+            groups = seeder.groups(options['groups'])
+            posts = seeder.posts(
+                options['posts'], users, groups,
+                options['author_exponent'], options['group_exponent'],
+                options['no_group_share'], options['days'],
+            )
+            if posts:
+                seeder.comments(
+                    options['comments'], users, posts,
+                    options['post_exponent'], options['days'],
+                )
+            seeder.follows(
+                options['follows'], users, options['author_exponent']
+            )
+        # Ленты раскладываются по счётчикам подписчиков.
+        call_command(
+            'reconcile_counters', batch_size=options['batch_size'],
+            stdout=self.stdout,
+        )
+        if not options['no_timelines']:
+            rebuild_timelines()
+        bump(SITE_SCOPE)
+        rows = sum(options[name] for name in (
+            'users', 'groups', 'posts', 'comments', 'follows'
+        ))
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'Создано строк: {rows} за {elapsed:.1f} с '
+            f'({rows / elapsed:.0f} строк/с)'
+        )
+
+    def progress(self, model, total):
+        if self.verbosity > 1:
+            self.stdout.write(f'{model._meta.verbose_name}: {total}')
@@ -0,0 +1,77 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def _totals(queryset, field):
+    return dict(
+        queryset.order_by().values(field).annotate(
+            total=models.Count('pk')
+        ).values_list(field, 'total')
+    )
+
+
+def fill_stats(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    GroupStats = apps.get_model('posts', 'GroupStats')
+    posts = _totals(Post.objects, 'author')
+    comments = _totals(Comment.objects, 'author')
+    followers = _totals(Follow.objects, 'author')
+    following = _totals(Follow.objects, 'user')
+    UserStats.objects.bulk_create(
+        (
+            UserStats(
+                user_id=user_id,
+                posts=posts.get(user_id, 0),
+                comments=comments.get(user_id, 0),
+                followers=followers.get(user_id, 0),
+                following=following.get(user_id, 0),
+            )
+            for user_id in User.objects.values_list('pk', flat=True)
+        ),
+        batch_size=1000,
+    )
+    group_posts = _totals(Post.objects.exclude(group=None), 'group')
+    GroupStats.objects.bulk_create(
+        (
+            GroupStats(group_id=group_id, posts=group_posts.get(group_id, 0))
+            for group_id in Group.objects.values_list('pk', flat=True)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0009_comment_post_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupStats',
+            fields=[
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='posts.Group')),
+                ('posts', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('comments', models.PositiveIntegerField(default=0, verbose_name='Комментариев')),
+                ('followers', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+                ('following', models.PositiveIntegerField(default=0, verbose_name='Подписок')),
+            ],
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
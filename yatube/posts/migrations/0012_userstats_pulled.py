@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_pulled(apps, schema_editor):
+    # Посты этих авторов и раньше не раскладывались по лентам.
+    UserStats = apps.get_model('posts', 'UserStats')
+    UserStats.objects.filter(
+        followers__gt=settings.FEED_FANOUT_THRESHOLD
+    ).update(pulled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='pulled',
+            field=models.BooleanField(default=False, verbose_name='Читается при чтении ленты'),
+        ),
+        migrations.RunPython(mark_pulled, migrations.RunPython.noop),
+    ]
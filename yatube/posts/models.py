@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import post_image_storage
+
 User = get_user_model()
 
 
@@ -40,8 +42,13 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=post_image_storage,
         blank=True,
     )
+    modified = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+    )
 
     def __str__(self):
         return self.text[:15]
@@ -50,6 +57,16 @@ class Post(models.Model):
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date'],
+                name='post_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date'],
+                name='post_group_pub_date_idx',
+            ),
+        ]
 
 
 class Comment(models.Model):
@@ -76,6 +93,12 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ('created',)
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                name='comment_post_created_idx',
+            ),
+        ]
 
 
 class Follow(models.Model):
@@ -102,4 +125,82 @@ class Follow(models.Model):
         ]
 
     def __str__(self):
-        return self.user
+        return str(self.user)
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписок пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        related_name='timeline',
+        on_delete=models.CASCADE,
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name='timeline',
+        on_delete=models.CASCADE,
+    )
+    author = models.ForeignKey(
+        User,
+        related_name='+',
+        on_delete=models.CASCADE,
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ['-pub_date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_post'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx',
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.post_id}'
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, которые обновляются сигналами."""
+
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name='stats',
+        on_delete=models.CASCADE,
+    )
+    posts = models.PositiveIntegerField('Постов', default=0)
+    comments = models.PositiveIntegerField('Комментариев', default=0)
+    followers = models.PositiveIntegerField('Подписчиков', default=0)
+    following = models.PositiveIntegerField('Подписок', default=0)
+    # Посты автора не раскладываются по лентам, а подмешиваются при
+    # чтении; флаг снимает только rebuild_timelines.
+    pulled = models.BooleanField('Читается при чтении ленты', default=False)
+
+    def __str__(self):
+        return f'{self.user_id}: {self.posts}'
+
+
+class GroupStats(models.Model):
+    """Счётчики группы, которые обновляются сигналами."""
+
+    group = models.OneToOneField(
+        Group,
+        primary_key=True,
+        related_name='stats',
+        on_delete=models.CASCADE,
+    )
+    posts = models.PositiveIntegerField('Постов', default=0)
+
+    def __str__(self):
+        return f'{self.group_id}: {self.posts}'
@@ -0,0 +1,226 @@
+import re
+from contextlib import contextmanager
+
+from django.db import connection
+
+from .models import Group, Post
+
+# Полнотекстовые индексы SQLite FTS5 поверх таблиц постов и групп.
+# Индексы хранят только токены (content=...), а триггеры синхронизируют
+# их при любых изменениях, включая bulk_create и QuerySet.update().
+FTS_TABLES = {
+    'posts_post_fts': """
+        CREATE VIRTUAL TABLE posts_post_fts USING fts5(
+            text, content='posts_post', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """,
+    'posts_group_fts': """
+        CREATE VIRTUAL TABLE posts_group_fts USING fts5(
+            title, description, content='posts_group', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """,
+}
+FTS_TRIGGERS = {
+    'posts_post_fts_insert': """
+        CREATE TRIGGER posts_post_fts_insert AFTER INSERT ON posts_post
+        BEGIN
+            INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text);
+        END
+    """,
+    'posts_post_fts_delete': """
+        CREATE TRIGGER posts_post_fts_delete AFTER DELETE ON posts_post
+        BEGIN
+            INSERT INTO posts_post_fts(posts_post_fts, rowid, text)
+            VALUES ('delete', old.id, old.text);
+        END
+    """,
+    'posts_post_fts_update': """
+        CREATE TRIGGER posts_post_fts_update AFTER UPDATE OF text ON posts_post
+        BEGIN
+            INSERT INTO posts_post_fts(posts_post_fts, rowid, text)
+            VALUES ('delete', old.id, old.text);
+            INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text);
+        END
+    """,
+    'posts_group_fts_insert': """
+        CREATE TRIGGER posts_group_fts_insert AFTER INSERT ON posts_group
+        BEGIN
+            INSERT INTO posts_group_fts(rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+    """,
+    'posts_group_fts_delete': """
+        CREATE TRIGGER posts_group_fts_delete AFTER DELETE ON posts_group
+        BEGIN
+            INSERT INTO posts_group_fts(
+                posts_group_fts, rowid, title, description
+            ) VALUES ('delete', old.id, old.title, old.description);
+        END
+    """,
+    'posts_group_fts_update': """
+        CREATE TRIGGER posts_group_fts_update
+        AFTER UPDATE OF title, description ON posts_group
+        BEGIN
+            INSERT INTO posts_group_fts(
+                posts_group_fts, rowid, title, description
+            ) VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO posts_group_fts(rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+    """,
+}
+POST_IDS_SQL = (
+    'SELECT rowid FROM posts_post_fts WHERE posts_post_fts MATCH %s'
+)
+# Вес заголовка группы в ранжировании bm25 выше описания.
+GROUP_TITLE_WEIGHT = 10.0
+SEARCH_GROUPS_LIMIT = 5
+
+WORD = re.compile(r'\w+')
+
+
+def fts_enabled(conn=connection):
+    return conn.vendor == 'sqlite'
+
+
+def _existing(cursor, kind):
+    cursor.execute(
+        'SELECT name FROM sqlite_master WHERE type = %s', [kind]
+    )
+    return {name for name, in cursor.fetchall()}
+
+
+def install_search_index(conn=connection, create_tables=True):
+    """Создаёт недостающие FTS-таблицы и триггеры и перестраивает индекс.
+
+    SQLite удаляет триггеры вместе с таблицей, а Django пересоздаёт
+    таблицу при многих миграциях, поэтому после migrate триггеры
+    восстанавливаются (create_tables=False: только если индекс уже есть).
+    """
+    if not fts_enabled(conn):
+        return
+    with conn.cursor() as cursor:
+        tables = _existing(cursor, 'table')
+        if not create_tables and not tables.issuperset(FTS_TABLES):
+            return
+        triggers = _existing(cursor, 'trigger')
+        changed = False
+        for name, sql in (*FTS_TABLES.items(), *FTS_TRIGGERS.items()):
+            if name not in tables and name not in triggers:
+                cursor.execute(sql)
+                changed = True
+        if changed:
+            for name in FTS_TABLES:
+                cursor.execute(
+                    f"INSERT INTO {name}({name}) VALUES ('rebuild')"
+                )
+
+
+def drop_search_index(conn=connection):
+    if not fts_enabled(conn):
+        return
+    with conn.cursor() as cursor:
+        for name in FTS_TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        for name in FTS_TABLES:
+            cursor.execute(f'DROP TABLE IF EXISTS {name}')
+
+
+@contextmanager
+def suspended_search_triggers(conn=connection):
+    """Снимает триггеры индекса на время массовой загрузки.
+
+    После загрузки триггеры возвращаются, а индекс перестраивается
+    целиком, что быстрее, чем обновлять его по строке.
+    """
+    if not fts_enabled(conn):
+        yield
+        return
+    with conn.cursor() as cursor:
+        if not _existing(cursor, 'table').issuperset(FTS_TABLES):
+            yield
+            return
+        for name in FTS_TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+    try:
+        yield
+    finally:
+        install_search_index(conn, create_tables=False)
+
+
+def fts_query(text):
+    """Запрос FTS5 из слов пользователя: все слова, последнее — префикс.
+
+    Слова берутся в кавычки, поэтому операторы FTS5 во вводе не работают.
+    """
+    words = WORD.findall(text.lower())
+    if not words:
+        return ''
+    return ' '.join(f'"{word}"' for word in words) + '*'
+
+
+class SearchResults:
+    """Посты по запросу в порядке релевантности для Paginator.
+
+    Страница сначала берёт id из индекса по bm25 с LIMIT/OFFSET, потом
+    одним запросом достаёт сами посты.
+    """
+
+    def __init__(self, query):
+        self.match = fts_query(query)
+
+    def count(self):
+        if not self.match:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM ({POST_IDS_SQL})', [self.match]
+            )
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        if not self.match:
+            return []
+        start = index.start or 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'{POST_IDS_SQL} ORDER BY rank LIMIT %s OFFSET %s',
+                [self.match, index.stop - start, start],
+            )
+            ids = [pk for pk, in cursor.fetchall()]
+        posts = Post.objects.select_related('author', 'group').in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def search_posts(query):
+    if fts_enabled():
+        return SearchResults(query)
+    # Без FTS5 поиск остаётся прежним LIKE по тексту.
+    if not query.strip():
+        return Post.objects.none()
+    return Post.objects.select_related('author', 'group').filter(
+        text__icontains=query.strip()
+    )
+
+
+def search_groups(query, limit=SEARCH_GROUPS_LIMIT):
+    match = fts_query(query)
+    if not match:
+        return []
+    if not fts_enabled():
+        return list(Group.objects.filter(title__icontains=query)[:limit])
+    groups = Group.objects.raw(
+        'SELECT posts_group.* FROM posts_group_fts '
+        'JOIN posts_group ON posts_group.id = posts_group_fts.rowid '
+        'WHERE posts_group_fts MATCH %s '
+        'ORDER BY bm25(posts_group_fts, %s, 1.0) LIMIT %s',
+        [match, GROUP_TITLE_WEIGHT, limit],
+    )
+    return list(groups)
@@ -0,0 +1,172 @@
+import random
+from array import array
+from datetime import datetime, timedelta, timezone
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from faker import Faker
+
+from .importing import chunks, preserved_dates
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+SEED_BATCH_SIZE = 10_000
+# Даты постов отсчитываются назад от фиксированного момента, чтобы
+# одинаковый seed давал одинаковую базу в любой день.
+SEED_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+# Из скольких фраз и имён Faker собираются данные: Faker медленный, а
+# выбор из готового набора почти ничего не стоит.
+FAKER_POOL_SIZE = 2000
+# Пароль, который Django считает неиспользуемым.
+UNUSABLE_PASSWORD = '!'
+
+
+class PowerLaw:
+    """Номера 0..n-1 с вероятностью, убывающей как (номер + 1) ** -exponent.
+
+    Номер считается по обратной функции распределения за O(1), без
+    таблицы весов, так что годится и для миллионов объектов: номер 0 —
+    самый популярный автор или группа, дальше длинный хвост.
+    """
+
+    def __init__(self, n, exponent, rng):
+        self.n = n
+        self.exponent = exponent
+        self.rng = rng
+
+    def sample(self):
+        u = self.rng.random()
+        if self.exponent == 1:
+            rank = self.n ** u
+        else:
+            power = 1 - self.exponent
+            rank = ((self.n ** power - 1) * u + 1) ** (1 / power)
+        return min(int(rank) - 1, self.n - 1)
+
+
+class Seeder:
+    """Генерирует пользователей, группы, посты, комментарии и подписки.
+
+    Все случайные значения берутся из одного random.Random(seed) и
+    Faker с тем же seed, поэтому повторный запуск на пустой базе даёт
+    те же данные. Строки пишутся bulk_create пачками по batch_size.
+    """
+
+    def __init__(self, seed, batch_size=SEED_BATCH_SIZE, locale='ru_RU',
+                 progress=None):
+        self.rng = random.Random(seed)
+        self.fake = Faker(locale)
+        self.fake.seed_instance(seed)
+        self.prefix = f's{seed}_'
+        self.batch_size = batch_size
+        self.progress = progress
+        self.texts = self._pool(self.fake.sentence)
+        self.first_names = self._pool(self.fake.first_name)
+        self.last_names = self._pool(self.fake.last_name)
+
+    def _pool(self, make):
+        return [make() for _ in range(FAKER_POOL_SIZE)]
+
+    def _bulk(self, model, objects):
+        total = 0
+        for batch in chunks(objects, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+            total += len(batch)
+            if self.progress is not None:
+                self.progress(model, total)
+        return total
+
+    def _ids(self, queryset):
+        return array('q', queryset.order_by('pk').values_list(
+            'pk', flat=True
+        ).iterator())
+
+    def _text(self, words_max):
+        return ' '.join(self.rng.choices(
+            self.texts, k=self.rng.randint(1, words_max)
+        ))
+
+    def _date(self, days):
+        return SEED_EPOCH - timedelta(seconds=self.rng.randrange(
+            days * 24 * 60 * 60
+        ))
+
+    def users(self, number):
+        self._bulk(User, (
+            User(
+                username=f'{self.prefix}{index}',
+                first_name=self.rng.choice(self.first_names),
+                last_name=self.rng.choice(self.last_names),
+                password=UNUSABLE_PASSWORD,
+            )
+            for index in range(number)
+        ))
+        return self._ids(User.objects.filter(
+            username__startswith=self.prefix
+        ))
+
+    def groups(self, number):
+        self._bulk(Group, (
+            Group(
+                title=self.fake.catch_phrase()[:200],
+                slug=f'{self.prefix}{index}',
+                description=self._text(3),
+            )
+            for index in range(number)
+        ))
+        return self._ids(Group.objects.filter(slug__startswith=self.prefix))
+
+    def posts(self, number, users, groups, author_exponent,
+              group_exponent, no_group_share, days):
+        authors = PowerLaw(len(users), author_exponent, self.rng)
+        group_ranks = PowerLaw(len(groups), group_exponent, self.rng)
+        first = Post.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+
+        def generate():
+            for _ in range(number):
+                group_id = None
+                if groups and self.rng.random() >= no_group_share:
+                    group_id = groups[group_ranks.sample()]
+                date = self._date(days)
+                yield Post(
+                    text=self._text(5),
+                    author_id=users[authors.sample()],
+                    group_id=group_id,
+                    pub_date=date,
+                    modified=date,
+                )
+
+        with preserved_dates():
+            self._bulk(Post, generate())
+        return self._ids(Post.objects.filter(pk__gt=first))
+
+    def comments(self, number, users, posts, post_exponent, days):
+        targets = PowerLaw(len(posts), post_exponent, self.rng)
+
+        def generate():
+            for _ in range(number):
+                yield Comment(
+                    post_id=posts[targets.sample()],
+                    author_id=users[self.rng.randrange(len(users))],
+                    text=self._text(2),
+                    created=self._date(days),
+                )
+
+        with preserved_dates():
+            return self._bulk(Comment, generate())
+
+    def follows(self, number, users, author_exponent):
+        authors = PowerLaw(len(users), author_exponent, self.rng)
+
+        def generate():
+            for _ in range(number):
+                user_id = users[self.rng.randrange(len(users))]
+                author_id = users[authors.sample()]
+                if user_id != author_id:
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        return self._bulk(Follow, generate())
@@ -0,0 +1,128 @@
+from django.db import connections
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from .caching import SITE_SCOPE, bump
+from .counters import change_group_stats, change_user_stats
+from .feeds import backfill_timeline, fan_out_post, prune_timeline
+from .models import Comment, Follow, Group, Post
+from .search import install_search_index
+
+
+@receiver(post_save, sender=Post)
+def push_post_to_timelines(sender, instance, created, **kwargs):
+    if created:
+        fan_out_post(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline_on_unfollow(sender, instance, **kwargs):
+    prune_timeline(instance.user_id, instance.author_id)
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_group(sender, instance, **kwargs):
+    instance._previous_group_id, instance._previous_group_slug = (
+        Post.objects.filter(pk=instance.pk).values_list(
+            'group_id', 'group__slug'
+        ).first() or (None, None)
+    )
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    if created:
+        change_user_stats(instance.author_id, posts=1)
+        previous = None
+    else:
+        previous = getattr(instance, '_previous_group_id', None)
+    if previous == instance.group_id:
+        return
+    if previous is not None:
+        change_group_stats(previous, posts=-1)
+    if instance.group_id is not None:
+        change_group_stats(instance.group_id, posts=1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    change_user_stats(instance.author_id, posts=-1)
+    if instance.group_id is not None:
+        change_group_stats(instance.group_id, posts=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, **kwargs):
+    if created:
+        change_user_stats(instance.author_id, comments=1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    change_user_stats(instance.author_id, comments=-1)
+
+
+@receiver(post_save, sender=Follow)
+def count_saved_follow(sender, instance, created, **kwargs):
+    if created:
+        change_user_stats(instance.author_id, followers=1)
+        change_user_stats(instance.user_id, following=1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    change_user_stats(instance.author_id, followers=-1)
+    change_user_stats(instance.user_id, following=-1)
+
+
+# Регистрируется после счётчиков: решение о раскладке постов автора
+# принимается по уже учтённой подписке.
+@receiver(post_save, sender=Follow)
+def fill_timeline_on_follow(sender, instance, created, **kwargs):
+    if created:
+        backfill_timeline(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    scopes = {
+        'index',
+        f'post:{instance.pk}',
+        f'profile:{instance.author.username}',
+    }
+    slugs = {getattr(instance, '_previous_group_slug', None)}
+    if instance.group_id is not None:
+        slugs.add(instance.group.slug)
+    scopes.update(f'group:{slug}' for slug in slugs if slug)
+    bump(*scopes)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_pages(sender, instance, **kwargs):
+    # На профиле комментатора выводится число его комментариев.
+    bump(f'post:{instance.post_id}', f'profile:{instance.author.username}')
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_pages(sender, instance, **kwargs):
+    bump(
+        f'profile:{instance.author.username}',
+        f'profile:{instance.user.username}',
+    )
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_pages(sender, instance, **kwargs):
+    bump(SITE_SCOPE)
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    # Миграции SQLite пересоздают таблицы и теряют их триггеры.
+    if sender.name == 'posts':
+        install_search_index(connections[using], create_tables=False)
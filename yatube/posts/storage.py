@@ -0,0 +1,47 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# Уровни вложенности и длина имени каталога: posts/ab/cd/abcd….jpg.
+SHARD_DEPTH = 2
+SHARD_WIDTH = 2
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hashed_name(name, digest):
+    """Имя файла по хэшу содержимого внутри каталога upload_to."""
+    directory, filename = os.path.split(name)
+    extension = os.path.splitext(filename)[1].lower()
+    shards = [
+        digest[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH]
+        for i in range(SHARD_DEPTH)
+    ]
+    return os.path.join(directory, *shards, digest + extension)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Файловое хранилище, где имя файла — sha256 его содержимого.
+
+    Файлы раскладываются по вложенным каталогам из первых символов
+    хэша, чтобы ни в одном каталоге не копились миллионы записей.
+    Одинаковые загрузки сохраняются на диск один раз: повторная
+    получает имя уже лежащего файла.
+    """
+
+    def _save(self, name, content):
+        name = hashed_name(name, content_hash(content))
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+
+post_image_storage = ContentAddressedStorage()
@@ -0,0 +1,15 @@
+from django import template
+
+from ..utils import ELLIPSIS, elided_page_range
+
+register = template.Library()
+
+
+@register.filter
+def page_links(page_obj):
+    return elided_page_range(page_obj)
+
+
+@register.filter
+def is_ellipsis(value):
+    return value == ELLIPSIS
@@ -0,0 +1,52 @@
+import hashlib
+
+from django import template
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from ..kvstore import preloaded_thumbnails
+
+register = template.Library()
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+CARD_KEY = 'post_card:{}:{}:{}'
+# Ключ карточки меняется вместе с Post.modified и именем автора,
+# TTL лишь чистит кэш.
+CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def card_key(post):
+    # Имя автора выводится в карточке, но правит его не Post.
+    author = hashlib.md5(post.author.get_full_name().encode()).hexdigest()
+    return CARD_KEY.format(post.pk, post.modified.timestamp(), author[:8])
+
+
+def render_card(post):
+    return render_to_string(CARD_TEMPLATE, {'post': post})
+
+
+@register.simple_tag
+def render_post_cards(posts):
+    """Карточки страницы: один get_many и один set_many на всю ленту."""
+    posts = list(posts)
+    keys = {post.pk: card_key(post) for post in posts}
+    cards = cache.get_many(keys.values())
+    stale = [post for post in posts if keys[post.pk] not in cards]
+    missing = {}
+    # Миниатюры всех пересобираемых карточек читаются одним запросом.
+    with preloaded_thumbnails(post.image for post in stale):
+        for post in stale:
+            missing[keys[post.pk]] = render_card(post)
+    if missing:
+        cache.set_many(missing, CARD_CACHE_TIMEOUT)
+        cards.update(missing)
+    return {post.pk: mark_safe(cards[keys[post.pk]]) for post in posts}
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post):
+    cards = context.get('post_cards') or {}
+    if post.pk in cards:
+        return cards[post.pk]
+    return mark_safe(render_card(post))
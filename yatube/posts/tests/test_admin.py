@@ -0,0 +1,80 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..admin import EstimatedCountPaginator
+from ..models import Comment, Follow, Group, Post
+from . import constans as const
+
+User = get_user_model()
+
+
+class AdminChangeListTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            const.USERNAME, const.EMAIL, const.PASSWORD)
+        cls.group = Group.objects.create(
+            title=const.TITLE,
+            slug=const.SLUG,
+            description=const.DESCRIPTION,
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_rows(self, number):
+        start = User.objects.count()
+        for index in range(start, start + number):
+            author = User.objects.create_user(username=f'author{index}')
+            post = Post.objects.create(
+                text=const.TEXT, author=author, group=self.group)
+            Comment.objects.create(post=post, author=author, text=const.TEXT)
+            Follow.objects.create(user=author, author=self.admin)
+
+    def queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Число запросов списков не зависит от числа строк."""
+        urls = [
+            reverse('admin:posts_post_changelist'),
+            reverse('admin:posts_comment_changelist'),
+            reverse('admin:posts_follow_changelist'),
+        ]
+        self.add_rows(2)
+        before = [self.queries(url) for url in urls]
+        self.add_rows(5)
+        self.assertEqual([self.queries(url) for url in urls], before)
+
+    def test_editable_group_is_autocomplete(self):
+        """Группа в списке постов выбирается автодополнением."""
+        self.add_rows(1)
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertContains(response, const.TITLE)
+
+    def test_paginator_uses_estimate_for_whole_table(self):
+        """Без фильтров число строк берётся из статистики базы."""
+        self.add_rows(3)
+        with mock.patch('posts.admin.estimated_count', return_value=10 ** 6):
+            whole = EstimatedCountPaginator(Post.objects.all(), 10)
+            filtered = EstimatedCountPaginator(
+                Post.objects.filter(group=self.group), 10)
+            self.assertEqual(whole.count, 10 ** 6)
+            self.assertEqual(filtered.count, 3)
+
+    def test_paginator_caps_exact_count(self):
+        """Точный подсчёт останавливается на пределе."""
+        self.add_rows(3)
+        with mock.patch('posts.admin.ADMIN_EXACT_COUNT_LIMIT', 2):
+            paginator = EstimatedCountPaginator(Post.objects.all(), 10)
+            self.assertEqual(paginator.count, 2)
@@ -0,0 +1,38 @@
+from django.test import TestCase
+
+from ..benchmark import measure, regressions
+from ..models import Group, Post, User
+
+
+class BenchmarkTest(TestCase):
+    def test_measure_reports_view_costs(self):
+        """Замер возвращает статус, число запросов, строк и байт."""
+        author = User.objects.create_user(username='bench')
+        group = Group.objects.create(title='Группа', slug='bench')
+        Post.objects.bulk_create(
+            Post(author=author, group=group, text=f'Пост {index}')
+            for index in range(15)
+        )
+        stats = measure('get', '/', repeat=3)
+        self.assertEqual(stats['status'], 200)
+        self.assertGreater(stats['queries'], 0)
+        self.assertGreaterEqual(stats['rows'], 10)
+        self.assertGreater(stats['bytes'], 0)
+        self.assertLessEqual(stats['p50_ms'], stats['p95_ms'])
+
+    def test_regressions_respect_tolerance(self):
+        """Лишний запрос — регрессия, небольшой рост времени — нет."""
+        baseline = {'small': {'index': {
+            'queries': 2, 'p95_ms': 10.0, 'rows': 10, 'bytes': 1000,
+        }}}
+        slower = {'small': {'index': {
+            'queries': 2, 'p95_ms': 14.0, 'rows': 10, 'bytes': 1050,
+        }}}
+        self.assertEqual(regressions(slower, baseline), [])
+        more_queries = {'small': {'index': {
+            'queries': 3, 'p95_ms': 10.0, 'rows': 10, 'bytes': 1000,
+        }}}
+        self.assertEqual(
+            regressions(more_queries, baseline),
+            ['small/index: queries 3 > 2'],
+        )
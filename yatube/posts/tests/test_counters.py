@@ -0,0 +1,77 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, GroupStats, Post, UserStats
+from . import constans as const
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=const.USERNAME)
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title=const.TITLE,
+            slug=const.SLUG,
+            description=const.DESCRIPTION,
+        )
+        cls.group1 = Group.objects.create(
+            title=const.TITLE1,
+            slug=const.SLUG1,
+            description=const.DESCRIPTION1,
+        )
+
+    def stats(self, user):
+        stats = UserStats.objects.get(user=user)
+        return stats.posts, stats.comments, stats.followers, stats.following
+
+    def test_signals_keep_counters(self):
+        """Сигналы меняют счётчики при создании и удалении объектов."""
+        post = Post.objects.create(
+            text=const.TEXT, author=self.author, group=self.group)
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text=const.TEXT)
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.stats(self.author), (1, 0, 1, 0))
+        self.assertEqual(self.stats(self.reader), (0, 1, 0, 1))
+        self.assertEqual(GroupStats.objects.get(group=self.group).posts, 1)
+
+        post.group = self.group1
+        post.save()
+        self.assertEqual(GroupStats.objects.get(group=self.group).posts, 0)
+        self.assertEqual(GroupStats.objects.get(group=self.group1).posts, 1)
+
+        follow.delete()
+        comment.delete()
+        post.delete()
+        self.assertEqual(self.stats(self.author), (0, 0, 0, 0))
+        self.assertEqual(self.stats(self.reader), (0, 0, 0, 0))
+        self.assertEqual(GroupStats.objects.get(group=self.group1).posts, 0)
+
+    def test_reconcile_repairs_drift(self):
+        """Команда чинит разъехавшиеся и недостающие счётчики."""
+        Post.objects.create(
+            text=const.TEXT, author=self.author, group=self.group)
+        UserStats.objects.filter(user=self.author).update(posts=42)
+        GroupStats.objects.filter(group=self.group).delete()
+        out = StringIO()
+        call_command('reconcile_counters', batch_size=1, stdout=out)
+        self.assertEqual(self.stats(self.author), (1, 0, 0, 0))
+        self.assertEqual(GroupStats.objects.get(group=self.group).posts, 1)
+        # Строки reader и group1 ещё не заводились: команда их создаёт.
+        self.assertIn('пользователей: 2, групп: 2', out.getvalue())
+
+    def test_profile_reads_counters(self):
+        """Профиль берёт число постов из счётчика без COUNT(*)."""
+        Post.objects.create(text=const.TEXT, author=self.author)
+        UserStats.objects.filter(user=self.author).update(posts=7)
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': const.USERNAME}))
+        self.assertContains(response, 'Всего постов: 7')
@@ -0,0 +1,88 @@
+import io
+import json
+import shutil
+import tempfile
+import zipfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+from . import constans as const
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=const.USERNAME)
+        cls.author = User.objects.create_user(username=const.USERNAME1)
+        cls.group = Group.objects.create(
+            title=const.TITLE,
+            slug=const.SLUG,
+            description=const.DESCRIPTION,
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.post = Post.objects.create(
+            text=const.TEXT, author=self.user, group=self.group,
+            image=SimpleUploadedFile('small.gif', const.SMALL_GIF),
+        )
+        Post.objects.create(text=const.TEXT1, author=self.author)
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий')
+        Follow.objects.create(user=self.user, author=self.author)
+        self.client.force_login(self.user)
+
+    def download(self, *args):
+        response = self.client.get(reverse('posts:export'), *args)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_export_jsonl(self):
+        """JSONL содержит только данные пользователя в формате импорта."""
+        records = [
+            json.loads(line)
+            for line in self.download().decode().splitlines()
+        ]
+        self.assertEqual(
+            [record['type'] for record in records],
+            ['post', 'comment', 'follow'],
+        )
+        self.assertEqual(records[0]['id'], self.post.pk)
+        self.assertEqual(records[0]['group'], const.SLUG)
+        self.assertEqual(records[2]['author'], const.USERNAME1)
+
+    def test_export_zip_with_images(self):
+        """ZIP содержит файлы JSONL и картинки постов."""
+        archive = zipfile.ZipFile(
+            io.BytesIO(self.download({'format': 'zip'})))
+        self.assertEqual(
+            sorted(archive.namelist()),
+            sorted([
+                'posts.jsonl', 'comments.jsonl', 'follows.jsonl',
+                f'images/{self.post.image.name}',
+            ]),
+        )
+        self.assertEqual(
+            archive.read(f'images/{self.post.image.name}'), const.SMALL_GIF)
+        post = json.loads(archive.read('posts.jsonl'))
+        self.assertEqual(post['text'], const.TEXT)
+
+    def test_export_requires_login(self):
+        self.client.logout()
+        response = self.client.get(reverse('posts:export'))
+        self.assertEqual(response.status_code, 302)
@@ -1,13 +1,22 @@
+import io
+import os
+import shutil
+import tempfile
 from http import HTTPStatus
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image, PngImagePlugin
 
+from ..forms import PostForm
 from ..models import Group, Post
 from . import constans as const
 
 User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
 class PostCreateFormTest(TestCase):
@@ -114,3 +123,111 @@ class PostCreateFormTest(TestCase):
         self.assertRedirects(response, reverse(
             'posts:profile', kwargs={'username': self.post.author.username}))
         self.assertEqual(Post.objects.count(), posts_count + 1)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageStorageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=const.USERNAME)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def upload(self, text, filename, content=const.SMALL_GIF):
+        return self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': text,
+                'image': SimpleUploadedFile(filename, content),
+            },
+        )
+
+    def create_post(self, text, filename, content=const.SMALL_GIF):
+        self.upload(text, filename, content)
+        return Post.objects.get(text=text)
+
+    def test_image_named_by_content_hash(self):
+        """Картинка сохраняется по хэшу содержимого во вложенный каталог."""
+        post = self.create_post('Первый', 'small.gif')
+        directory, filename = os.path.split(post.image.name)
+        digest, extension = os.path.splitext(filename)
+        self.assertEqual(extension, '.gif')
+        self.assertEqual(
+            directory, os.path.join('posts', digest[:2], digest[2:4]))
+        self.assertTrue(os.path.exists(post.image.path))
+
+    def test_duplicate_upload_stored_once(self):
+        """Одинаковые картинки под разными именами хранятся одним файлом."""
+        first = self.create_post('Первый', 'small.gif')
+        second = self.create_post('Второй', 'copy.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(
+            os.listdir(os.path.dirname(first.image.path)),
+            [os.path.basename(first.image.name)],
+        )
+
+    @override_settings(IMAGE_MAX_SIDE=10)
+    def test_image_normalized_on_upload(self):
+        """Картинка поворачивается по EXIF, уменьшается и теряет EXIF."""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        buffer = io.BytesIO()
+        Image.new('RGB', (40, 20)).save(buffer, 'JPEG', exif=exif.tobytes())
+        post = self.create_post('Фото', 'photo.jpg', buffer.getvalue())
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (5, 10))
+            self.assertNotIn('exif', image.info)
+
+    def test_png_metadata_removed(self):
+        """Из PNG удаляются EXIF с GPS и текстовые блоки."""
+        exif = Image.Exif()
+        exif[0x010F] = 'SecretCam'
+        exif[0x8825] = {1: 'N'}
+        text = PngImagePlugin.PngInfo()
+        text.add_text('Comment', 'секрет')
+        buffer = io.BytesIO()
+        Image.new('RGB', (4, 4)).save(
+            buffer, 'PNG', exif=exif.tobytes(), pnginfo=text)
+        post = self.create_post('PNG', 'photo.png', buffer.getvalue())
+        with open(post.image.path, 'rb') as file:
+            content = file.read()
+        self.assertNotIn(b'SecretCam', content)
+        self.assertNotIn('секрет'.encode(), content)
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.format, 'PNG')
+            self.assertNotIn('exif', image.info)
+            self.assertEqual(len(image.getexif()), 0)
+
+    def test_truncated_image_rejected(self):
+        """Обрезанный JPEG даёт ошибку формы, а не ошибку сервера."""
+        buffer = io.BytesIO()
+        Image.effect_noise((200, 200), 64).convert('RGB').save(
+            buffer, 'JPEG')
+        content = buffer.getvalue()
+        form = PostForm(
+            data={'text': 'Обрезанная'},
+            files={'image': SimpleUploadedFile(
+                'cut.jpg', content[:len(content) // 2], 'image/jpeg')},
+        )
+        self.assertFalse(form.is_valid())
+        self.assertEqual(
+            form.errors['image'],
+            ['Не удалось прочитать картинку: файл повреждён'])
+
+    @override_settings(IMAGE_MAX_PIXELS=1)
+    def test_huge_image_rejected(self):
+        """Картинка больше IMAGE_MAX_PIXELS не принимается."""
+        form = PostForm(
+            data={'text': 'Огромная'},
+            files={'image': SimpleUploadedFile('small.gif', const.SMALL_GIF)},
+        )
+        self.assertEqual(
+            form.errors['image'], ['Картинка больше 1 пикселей'])
@@ -0,0 +1,120 @@
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import (Comment, Follow, Group, GroupStats, Post, TimelineEntry,
+                      UserStats)
+from ..search import search_posts
+from . import constans as const
+
+User = get_user_model()
+
+
+class ImportContentTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=const.USERNAME)
+        cls.reader = User.objects.create_user(username=const.USERNAME1)
+        Group.objects.create(
+            title=const.TITLE,
+            slug=const.SLUG,
+            description=const.DESCRIPTION,
+        )
+
+    def run_import(self, kind, content, suffix='.jsonl', *args):
+        with tempfile.NamedTemporaryFile(
+            'w', suffix=suffix, delete=False, encoding='utf-8'
+        ) as file:
+            file.write(content)
+        self.addCleanup(os.remove, file.name)
+        out, err = StringIO(), StringIO()
+        call_command(
+            'import_content', kind, file.name, '--batch-size', '2', *args,
+            stdout=out, stderr=err,
+        )
+        return out.getvalue(), err.getvalue()
+
+    def test_import_posts_comments_follows(self):
+        """Посты, комментарии и подписки загружаются с датами из файла."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [
+            {'id': 100 + index, 'author': const.USERNAME,
+             'group': const.SLUG, 'text': f'Импорт {index}',
+             'pub_date': f'2020-01-0{index + 1}T10:00:00Z'}
+            for index in range(3)
+        ]
+        posts.append({'author': 'nobody', 'text': 'Без автора'})
+        out, err = self.run_import(
+            'post', '\n'.join(json.dumps(post) for post in posts))
+        self.assertIn('Загружено: 3, уже были: 0, пропущено: 1', out)
+        self.assertIn("нет автора 'nobody'", err)
+        post = Post.objects.get(pk=100)
+        self.assertEqual(
+            post.pub_date, datetime(2020, 1, 1, 10, tzinfo=timezone.utc))
+        self.assertEqual(UserStats.objects.get(user=self.author).posts, 3)
+        self.assertEqual(GroupStats.objects.get(group=post.group).posts, 3)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 3)
+        self.assertEqual(
+            sorted(post.pk for post in search_posts('импорт')[:10]),
+            [100, 101, 102],
+        )
+
+        out, _ = self.run_import(
+            'comment',
+            'post,author,text,created\n'
+            f'100,{const.USERNAME1},Первый,2020-02-01 10:00\n'
+            f'999,{const.USERNAME1},К несуществующему,\n',
+            '.csv',
+        )
+        self.assertIn('Загружено: 1, уже были: 0, пропущено: 1', out)
+        self.assertEqual(Comment.objects.get(post_id=100).text, 'Первый')
+
+        out, _ = self.run_import(
+            'follow',
+            json.dumps({'user': 'newbie', 'author': const.USERNAME}),
+            '.jsonl', '--create-missing',
+        )
+        self.assertIn('Загружено: 1', out)
+        newbie = User.objects.get(username='newbie')
+        self.assertFalse(newbie.has_usable_password())
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=newbie).count(), 3)
+        self.assertEqual(UserStats.objects.get(user=self.author).followers, 2)
+
+    def test_broken_lines_are_skipped(self):
+        """Нечитаемые строки пропускаются, соседние загружаются."""
+        content = '\n'.join((
+            json.dumps({'author': const.USERNAME, 'text': 'До'}),
+            '{"author": ',
+            '[1]',
+            json.dumps({'author': const.USERNAME, 'text': 'После'}),
+        ))
+        out, err = self.run_import('post', content)
+        self.assertIn('Загружено: 2, уже были: 0, пропущено: 2', out)
+        self.assertIn('2: некорректный JSON', err)
+        self.assertIn('3: строка не является объектом JSON', err)
+        self.assertEqual(
+            sorted(Post.objects.values_list('text', flat=True)),
+            ['До', 'После'],
+        )
+
+    def test_reimport_counts_duplicates(self):
+        """Повторная загрузка тех же id не считается загруженной."""
+        content = json.dumps(
+            {'id': 200, 'author': const.USERNAME, 'text': 'Один раз'})
+        self.run_import('post', content)
+        out, _ = self.run_import('post', content)
+        self.assertIn('Загружено: 0, уже были: 1, пропущено: 0', out)
+        self.assertEqual(Post.objects.filter(pk=200).count(), 1)
+        follow = json.dumps(
+            {'user': const.USERNAME1, 'author': const.USERNAME})
+        out, _ = self.run_import('follow', f'{follow}\n{follow}')
+        self.assertIn('Загружено: 1, уже были: 1, пропущено: 0', out)
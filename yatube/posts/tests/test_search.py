@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Group, Post
+from ..search import fts_query, install_search_index, search_posts
+from ..utils import NUMBER_OF_POSTS_ON_PAGE
+from . import constans as const
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=const.USERNAME)
+        cls.group = Group.objects.create(
+            title='Котики',
+            slug=const.SLUG,
+            description='Всё о кошках',
+        )
+        cls.weak = Post.objects.create(
+            text='Про собак и немного про котов', author=cls.user)
+        cls.strong = Post.objects.create(
+            text='Коты, коты и ещё раз коты', author=cls.user)
+        Post.objects.create(text='Совсем о другом', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def found(self, query):
+        return [post.pk for post in search_posts(query)[:100]]
+
+    def test_ranked_results(self):
+        """Более релевантный пост идёт первым, лишние не находятся."""
+        # Последнее слово ищется как префикс: «кот» находит «котов».
+        self.assertEqual(self.found('кот'), [self.strong.pk, self.weak.pk])
+
+    def test_index_follows_changes(self):
+        """Триггеры обновляют индекс при update, delete и bulk_create."""
+        Post.objects.filter(pk=self.weak.pk).update(text='Теперь о попугаях')
+        self.assertEqual(self.found('попугаях'), [self.weak.pk])
+        self.assertEqual(self.found('котов'), [])
+        Post.objects.filter(pk=self.strong.pk).delete()
+        self.assertEqual(self.found('коты'), [])
+        Post.objects.bulk_create([Post(text='Пачка котов', author=self.user)])
+        self.assertEqual(len(self.found('котов')), 1)
+
+    def test_query_syntax_is_escaped(self):
+        """Операторы FTS5 во вводе не ломают запрос."""
+        self.assertEqual(fts_query('коты" OR (NEAR'), '"коты" "or" "near"*')
+        self.assertEqual(self.found('"коты" AND'), [])
+        self.assertEqual(self.found('  '), [])
+
+    def test_search_view(self):
+        """Страница поиска выводит посты, группы и сохраняет запрос."""
+        Post.objects.bulk_create(
+            Post(text=f'Коты {i}', author=self.user)
+            for i in range(NUMBER_OF_POSTS_ON_PAGE)
+        )
+        response = self.client.get(reverse('posts:search'), {'q': 'кот'})
+        self.assertEqual(list(response.context['groups']), [self.group])
+        page_obj = response.context['page_obj']
+        self.assertEqual(
+            page_obj.paginator.count, NUMBER_OF_POSTS_ON_PAGE + 2)
+        self.assertContains(
+            response, 'href="?q=%D0%BA%D0%BE%D1%82&amp;page=2"')
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт по FTS-индексу."""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', const.PASSWORD)
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'кот'})
+        self.assertEqual(
+            set(response.context['cl'].result_list),
+            {self.strong, self.weak},
+        )
+
+    def test_triggers_restored_after_migrate(self):
+        """После миграций недостающие триггеры создаются заново."""
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER posts_post_fts_insert')
+        install_search_index(connection, create_tables=False)
+        post = Post.objects.create(text='Новые коты', author=self.user)
+        self.assertIn(post.pk, self.found('новые'))
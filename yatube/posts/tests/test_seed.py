@@ -0,0 +1,51 @@
+import random
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post, TimelineEntry, UserStats
+from ..seeding import PowerLaw
+
+
+class SeedDataTest(TestCase):
+    def seed(self):
+        call_command(
+            'seed_data', '--users', '50', '--groups', '5', '--posts', '300',
+            '--comments', '200', '--follows', '100', '--batch-size', '64',
+            stdout=StringIO(),
+        )
+        return list(Post.objects.order_by('pk').values_list(
+            'author__username', 'group__slug', 'text', 'pub_date'))
+
+    def test_seed_creates_linked_data(self):
+        """Команда создаёт данные и досчитывает счётчики и ленты."""
+        posts = self.seed()
+        self.assertEqual(len(posts), 300)
+        self.assertEqual(Group.objects.count(), 5)
+        self.assertEqual(Comment.objects.count(), 200)
+        top = Post.objects.values('author').annotate(
+            total=Count('pk')).order_by('-total').first()
+        self.assertEqual(
+            UserStats.objects.get(user_id=top['author']).posts, top['total'])
+        follow = Follow.objects.first()
+        self.assertEqual(
+            TimelineEntry.objects.filter(
+                user_id=follow.user_id, author_id=follow.author_id).count(),
+            Post.objects.filter(author_id=follow.author_id).count(),
+        )
+
+    def test_seed_is_deterministic(self):
+        """Один и тот же seed даёт одни и те же посты."""
+        posts = self.seed()
+        Post.objects.all().delete()
+        self.assertEqual(
+            [post[2:] for post in self.seed()], [post[2:] for post in posts])
+
+    def test_power_law_prefers_first_ranks(self):
+        """Первые номера выпадают заметно чаще хвоста."""
+        law = PowerLaw(1000, 1.2, random.Random(1))
+        ranks = [law.sample() for _ in range(10_000)]
+        self.assertTrue(all(0 <= rank < 1000 for rank in ranks))
+        self.assertGreater(ranks.count(0), 20 * ranks.count(500) + 100)
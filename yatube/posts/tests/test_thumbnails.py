@@ -0,0 +1,131 @@
+import re
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+
+from ..kvstore import preloaded_thumbnails, thumbnail_key
+from ..models import Post
+from ..thumbnails import (THUMBNAIL_VARIANTS, THUMBNAIL_WIDTHS,
+                          size_variants)
+from . import constans as const
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPregenerationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=const.USERNAME)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # Записи sorl в кэше переживают откат БД между тестами.
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def upload(self):
+        return SimpleUploadedFile(
+            'small.gif', const.SMALL_GIF, content_type='image/gif')
+
+    def test_upload_queues_thumbnails(self):
+        """Загрузка картинки ставит миниатюры в очередь."""
+        with mock.patch('posts.views.queue_thumbnails') as queue:
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                data={'text': 'С картинкой', 'image': self.upload()},
+            )
+        post = Post.objects.get(text='С картинкой')
+        queue.assert_called_once_with(post)
+
+    def test_command_generates_all_variants(self):
+        """Команда создаёт все варианты миниатюр существующих постов."""
+        post = Post.objects.create(
+            author=self.user, text='Старый пост', image=self.upload())
+        call_command('pregenerate_thumbnails', workers=0, stdout=mock.Mock())
+        source = ImageFile(post.image)
+        thumbnails = default.kvstore._get(source.key, identity='thumbnails')
+        self.assertEqual(len(thumbnails), len(THUMBNAIL_VARIANTS))
+
+    def test_preloaded_thumbnails_batch_lookups(self):
+        """Миниатюры страницы читаются одним запросом, а не по одной."""
+        posts = [
+            Post.objects.create(
+                author=self.user, text=f'Пост {i}', image=self.upload())
+            for i in range(3)
+        ]
+        call_command('pregenerate_thumbnails', workers=0, stdout=mock.Mock())
+        cache.clear()
+        images = [post.image for post in posts]
+        with self.assertNumQueries(1):
+            with preloaded_thumbnails(images):
+                for image in images:
+                    for geometry, options in THUMBNAIL_VARIANTS:
+                        thumbnail = get_thumbnail(image, geometry, **options)
+                        self.assertTrue(thumbnail.exists())
+        with self.assertNumQueries(0):
+            with preloaded_thumbnails(images):
+                pass
+
+    def test_thumbnail_key_matches_backend(self):
+        """Ключ предзагрузки совпадает с ключом, который пишет sorl."""
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=self.upload())
+        geometry, options = THUMBNAIL_VARIANTS[0]
+        thumbnail = get_thumbnail(post.image, geometry, **options)
+        self.assertEqual(
+            thumbnail_key(post.image, geometry, options),
+            add_prefix(thumbnail.key),
+        )
+
+    def test_post_image_srcset_from_pregenerated_variants(self):
+        """post_image выводит srcset из готовых вариантов одним запросом."""
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=self.upload())
+        call_command('pregenerate_thumbnails', workers=0, stdout=mock.Mock())
+        cache.clear()
+        template = Template(
+            '{% load post_images %}{% post_image image "card" %}')
+        with self.assertNumQueries(1):
+            html = template.render(Context({'image': post.image}))
+        srcset = re.search(r' srcset="([^"]+)"', html).group(1)
+        self.assertEqual(
+            [item.split()[1] for item in srcset.split(', ')],
+            [f'{width}w' for width in (*THUMBNAIL_WIDTHS, 900)],
+        )
+        self.assertIn('sizes="(max-width: 900px) 100vw, 900px"', html)
+
+    def test_webp_variants_when_supported(self):
+        """При поддержке WebP у каждой ширины есть вариант в WebP."""
+        with mock.patch(
+            'posts.thumbnails.THUMBNAIL_FORMATS', ('JPEG', 'WEBP')
+        ):
+            variants = size_variants('card')
+        self.assertEqual(
+            [(image_format, width) for image_format, width, *_ in variants],
+            [
+                ('JPEG', 320), ('JPEG', 640), ('JPEG', 900),
+                ('WEBP', 320), ('WEBP', 640), ('WEBP', 900),
+            ],
+        )
+        self.assertEqual(variants[3][2:], ('320x213', {
+            'crop': 'center', 'upscale': True, 'format': 'WEBP'}))
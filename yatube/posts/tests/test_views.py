@@ -1,15 +1,29 @@
+import re
+
 from django import forms
+from django.conf import settings
+from django.core.paginator import Paginator
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
-from ..models import Comment, Follow, Group, Post
+from core.nplusone import MODE_RAISE
+
+from ..caching import check_page_cache, page_timeout
+from ..feeds import rebuild_timelines
+from ..models import Comment, Follow, Group, Post, TimelineEntry
+from ..templatetags.post_cards import card_key
+from ..utils import (ELLIPSIS, KEYSET_OFFSET_PAGES,
+                     NUMBER_OF_COMMENTS_ON_PAGE, NUMBER_OF_POSTS_ON_PAGE,
+                     elided_page_range)
+from ..views import SAVE_GENERATED_PAGE_FOR
 from . import constans as const
 
 User = get_user_model()
 
 
+@override_settings(NPLUSONE_MODE=MODE_RAISE)
 class PostPagesTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -157,7 +171,7 @@ class PostPagesTests(TestCase):
     def test_cache(self):
         post = Post.objects.create(text='Тест кэша', author=self.user)
         post_on_main = self.guest_client.get(reverse('posts:index')).content
-        post.delete()
+        Post.objects.filter(pk=post.pk).update(text='Без сигналов')
         post_in_cache = self.guest_client.get(reverse('posts:index')).content
         self.assertEqual(post_on_main, post_in_cache)
         cache.clear()
@@ -165,7 +179,87 @@ class PostPagesTests(TestCase):
             reverse('posts:index')).content
         self.assertNotEqual(post_on_main, post_after_clean_cache)
 
+    def test_post_cards_cached_by_modification_time(self):
+        """Карточка поста кэшируется и обновляется после правки."""
+        post = Post.objects.get(pk=self.post.pk)
+        self.guest_client.get(reverse('posts:index'))
+        key = card_key(post)
+        self.assertIn(post.text, cache.get(key))
+        cache.set(key, 'Карточка из кэша')
+        response = self.guest_client.get(reverse(
+            'posts:group_list', kwargs={'slug': post.group.slug}))
+        self.assertContains(response, 'Карточка из кэша')
+        post.text = 'Исправленный текст'
+        post.save()
+        response = self.guest_client.get(reverse(
+            'posts:group_list', kwargs={'slug': post.group.slug}))
+        self.assertContains(response, 'Исправленный текст')
+        self.assertNotEqual(card_key(post), key)
+
+    def test_post_card_follows_author_name(self):
+        """После смены имени автора карточка показывает новое имя."""
+        post = Post.objects.get(pk=self.post.pk)
+        url = reverse('posts:group_list', kwargs={'slug': post.group.slug})
+        # Страницы вошедших не кэшируются целиком, только карточки.
+        self.authorized_client.get(url)
+        self.assertIn(post.text, cache.get(card_key(post)))
+        author = post.author
+        author.first_name, author.last_name = 'Новое', 'Имя'
+        author.save()
+        self.assertContains(self.authorized_client.get(url), 'Новое Имя')
+
+    def test_cache_invalidated_by_signals(self):
+        """Изменения постов и комментариев сразу сбрасывают кэш страниц."""
+        post = Post.objects.create(
+            text='Тест кэша', author=self.user, group=self.post.group)
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.post.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), post.text)
+        post.delete()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertNotContains(self.guest_client.get(url), post.text)
+        detail = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        self.guest_client.get(detail)
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Свежий комментарий')
+        self.assertContains(
+            self.guest_client.get(detail), 'Свежий комментарий')
+
+    def test_long_page_ttl_needs_shared_cache(self):
+        """Долгий TTL страниц включается только в общем кэше."""
+        self.assertEqual(
+            page_timeout(SAVE_GENERATED_PAGE_FOR),
+            settings.PAGE_LOCAL_CACHE_TIMEOUT,
+        )
+        self.assertEqual(
+            [warning.id for warning in check_page_cache(None)],
+            ['posts.W001'],
+        )
+        memcached = 'django.core.cache.backends.memcached.MemcachedCache'
+        with override_settings(CACHES={'default': {'BACKEND': memcached}}):
+            self.assertEqual(
+                page_timeout(SAVE_GENERATED_PAGE_FOR), SAVE_GENERATED_PAGE_FOR)
+            self.assertEqual(check_page_cache(None), [])
+
+    def test_comment_refreshes_commenter_profile(self):
+        """Комментарий сразу меняет счётчик на профиле комментатора."""
+        profile = reverse(
+            'posts:profile', kwargs={'username': self.user.username})
+        self.assertContains(self.guest_client.get(profile), 'комментариев: 0')
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            data={'text': 'Комментарий'},
+        )
+        self.assertContains(self.guest_client.get(profile), 'комментариев: 1')
+
 
+@override_settings(NPLUSONE_MODE=MODE_RAISE)
 class PaginatorViewTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -213,7 +307,30 @@ class PaginatorViewTest(TestCase):
             response = self.client.get(url + '?page=2')
             self.assertEqual(len(response.context['page_obj']), 3)
 
+    def test_elided_page_range(self):
+        """Ссылки пагинатора ограничены окном вокруг текущей страницы."""
+        paginator = Paginator(range(1000), NUMBER_OF_POSTS_ON_PAGE)
+        cases = {
+            1: [1, 2, 3, ELLIPSIS, 100],
+            50: [1, ELLIPSIS, 48, 49, 50, 51, 52, ELLIPSIS, 100],
+            100: [1, ELLIPSIS, 98, 99, 100],
+        }
+        for number, expected in cases.items():
+            with self.subTest(number=number):
+                self.assertEqual(
+                    elided_page_range(paginator.page(number)), expected)
+        self.assertEqual(
+            elided_page_range(Paginator(range(30), 10).page(2)), [1, 2, 3])
+
+    @override_settings(POSTS_KEYSET_PAGINATION=False)
+    def test_paginator_renders_window(self):
+        response = self.client.get(reverse(
+            'posts:group_list', kwargs={'slug': self.group.slug}))
+        self.assertContains(response, '?page=2')
+        self.assertNotContains(response, ELLIPSIS)
 
+
+@override_settings(NPLUSONE_MODE=MODE_RAISE)
 class FollowTests(TestCase):
     def setUp(self):
         self.client_following = Client()
@@ -270,3 +387,264 @@ class FollowTests(TestCase):
             reverse('posts:follow_index')
         )
         self.assertNotIn(self.post, response.context.get('page_obj'))
+
+    def test_timeline_follows_subscriptions(self):
+        """Лента подписок заполняется, дополняется и очищается."""
+        self.client_subscriber.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.following}))
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.subscriber, post=self.post).exists())
+        new_post = Post.objects.create(
+            author=self.following, text='Новая запись')
+        response = self.client_subscriber.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), [new_post, self.post])
+        self.client_subscriber.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.following}))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.subscriber).exists())
+        response = self.client_subscriber.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    @override_settings(FEED_FANOUT_THRESHOLD=1)
+    def test_popular_author_posts_are_pulled(self):
+        """Посты популярного автора подмешиваются в ленту при чтении."""
+        fan = User.objects.create_user(username='fan')
+        for user in (self.subscriber, fan):
+            Follow.objects.create(user=user, author=self.following)
+        Follow.objects.create(user=self.subscriber, author=fan)
+        fan_post = Post.objects.create(author=fan, text='Обычный автор')
+        popular_post = Post.objects.create(
+            author=self.following, text='Популярный автор')
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=popular_post).exists())
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.subscriber, post=fan_post).exists())
+        response = self.client_subscriber.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']),
+            [popular_post, fan_post, self.post],
+        )
+        Follow.objects.get(user=fan, author=self.following).delete()
+        # Отписка не дозаполняет ленты: автор по-прежнему читается при
+        # чтении, пока rebuild_timelines не вернёт его в раскладку.
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=popular_post).exists())
+        response = self.client_subscriber.get(reverse('posts:follow_index'))
+        self.assertIn(popular_post, response.context['page_obj'])
+        rebuild_timelines()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.subscriber, post=popular_post).exists())
+
+
+@override_settings(POSTS_KEYSET_PAGINATION=True, NPLUSONE_MODE=MODE_RAISE)
+class KeysetPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=const.USERNAME)
+        Post.objects.bulk_create(
+            Post(text=f'Test post {i}', author=cls.author)
+            for i in range(NUMBER_OF_POSTS_ON_PAGE * (KEYSET_OFFSET_PAGES + 2))
+        )
+        cls.expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse(
+            'posts:profile', kwargs={'username': self.author.username})
+
+    def walk(self, query, attr):
+        pages = []
+        while query:
+            cache.clear()
+            page_obj = self.client.get(
+                self.url + '?' + query).context['page_obj']
+            pages.append(page_obj)
+            query = getattr(page_obj.paginator, attr)
+        return pages
+
+    def test_walk_forward_and_back(self):
+        """Курсоры проходят всю ленту вперёд и назад без пропусков."""
+        pages = self.walk('page=1', 'next_query')
+        self.assertEqual(
+            [post.pk for page_obj in pages for post in page_obj],
+            self.expected,
+        )
+        self.assertEqual(
+            [page_obj.number for page_obj in pages],
+            list(range(1, len(pages) + 1)),
+        )
+        self.assertIn('cursor=', pages[-1].paginator.previous_query)
+        back = self.walk(pages[-1].paginator.previous_query, 'previous_query')
+        self.assertEqual(
+            [post.pk for page_obj in reversed(back) for post in page_obj],
+            self.expected[:-NUMBER_OF_POSTS_ON_PAGE],
+        )
+
+    def test_first_pages_keep_page_numbers(self):
+        """Первые страницы доступны по ?page=N и не считают COUNT(*)."""
+        response = self.client.get(self.url + '?page=2')
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.number, 2)
+        self.assertEqual(page_obj.paginator.previous_query, 'page=1')
+        self.assertEqual(page_obj.paginator.next_query, 'page=3')
+        self.assertEqual(
+            [post.pk for post in page_obj],
+            self.expected[NUMBER_OF_POSTS_ON_PAGE:NUMBER_OF_POSTS_ON_PAGE * 2],
+        )
+
+    def test_invalid_cursor_returns_first_page(self):
+        response = self.client.get(self.url + '?cursor=bad')
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.number, 1)
+        self.assertEqual(page_obj[0].pk, self.expected[0])
+
+
+@override_settings(NPLUSONE_MODE=MODE_RAISE)
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=const.USERNAME)
+        cls.post = Post.objects.create(text=const.TEXT, author=cls.user)
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {i}')
+            for i in range(NUMBER_OF_COMMENTS_ON_PAGE + 5)
+        )
+        cls.expected = list(
+            cls.post.comments.order_by('created', 'pk').values_list(
+                'pk', flat=True)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_detail_renders_first_comments(self):
+        """На странице поста первые комментарии с авторами без N+1."""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.pk for comment in comments],
+            self.expected[:NUMBER_OF_COMMENTS_ON_PAGE],
+        )
+        with self.assertNumQueries(0):
+            [comment.author.username for comment in comments]
+        self.assertContains(response, 'js-more-comments')
+
+    def test_comments_endpoint_json_walk(self):
+        """JSON-эндпоинт отдаёт оставшиеся комментарии по курсору."""
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.pk})
+        seen = []
+        next_url = url + '?format=json'
+        while next_url:
+            data = self.client.get(next_url).json()
+            seen.extend(comment['id'] for comment in data['comments'])
+            next_url = data['next']
+        self.assertEqual(seen, self.expected)
+
+    def test_comments_endpoint_fragment(self):
+        """Без format=json эндпоинт отдаёт HTML-фрагмент."""
+        first = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        ).context['comments']
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk})
+            + '?' + first.paginator.next_query
+        )
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertEqual(
+            [comment.pk for comment in response.context['comments']],
+            self.expected[NUMBER_OF_COMMENTS_ON_PAGE:],
+        )
+        self.assertNotContains(response, 'js-more-comments')
+
+
+@override_settings(NPLUSONE_MODE=MODE_RAISE)
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=const.USERNAME)
+        cls.group = Group.objects.create(
+            title=const.TITLE,
+            slug=const.SLUG,
+            description=const.DESCRIPTION,
+        )
+        cls.post = Post.objects.create(
+            text=const.TEXT, author=cls.author, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': const.SLUG}),
+            reverse('posts:profile', kwargs={'username': const.USERNAME}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+
+    def test_matching_etag_gets_not_modified(self):
+        """Совпавший ETag даёт 304 без рендеринга шаблона."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn('Last-Modified', response)
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+                self.assertFalse(response.templates)
+
+    def test_changes_update_etag(self):
+        """Новый пост и комментарий меняют ETag страниц."""
+        etags = [self.client.get(url)['ETag'] for url in self.urls]
+        Post.objects.create(text=const.TEXT1, author=self.author,
+                            group=self.group)
+        Comment.objects.create(
+            post=self.post, author=self.author, text=const.TEXT)
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_pages_not_shared_between_viewers(self):
+        """Страницы одного пользователя не достаются другим из кэша."""
+        alice = User.objects.create_user(username='alice')
+        bob = User.objects.create_user(username='bob')
+        Follow.objects.create(user=alice, author=self.author)
+        clients = {}
+        for user in (alice, bob):
+            clients[user.username] = Client()
+            clients[user.username].force_login(user)
+        anonymous = Client()
+        for url in self.urls[2:]:
+            with self.subTest(url=url):
+                alice_page = clients['alice'].get(url).content.decode()
+                token = re.search(
+                    r'name="csrfmiddlewaretoken" value="([^"]+)"', alice_page)
+                for client in (clients['bob'], anonymous):
+                    page = client.get(url).content.decode()
+                    self.assertNotIn('alice', page)
+                    self.assertNotIn('Отписаться', page)
+                    if token is not None:
+                        self.assertNotIn(token.group(1), page)
+                self.assertIn('bob', clients['bob'].get(url).content.decode())
+
+    def test_cache_headers(self):
+        """Страницы хранит только браузер, общим кэшам они не отдаются."""
+        response = self.client.get(self.urls[0])
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('public', response['Cache-Control'])
+        self.assertIn('max-age=0', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+        self.assertNotIn('Expires', response)
+        anonymous_etag = response['ETag']
+        self.client.force_login(self.author)
+        response = self.client.get(
+            self.urls[0], HTTP_IF_NONE_MATCH=anonymous_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
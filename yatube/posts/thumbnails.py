@@ -0,0 +1,112 @@
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.db import transaction
+from PIL import features
+
+from core.metrics import THUMBNAIL_DURATION, store
+
+from .storage import post_image_storage
+
+logger = logging.getLogger(__name__)
+
+# Размеры, в которых шаблоны выводят картинку поста.
+THUMBNAIL_SIZES = {
+    'card': ('900x600', {'crop': 'center', 'upscale': True}),
+    'detail': ('960x339', {'upscale': True}),
+}
+# Меньшие ширины для srcset: узким экранам не нужна полная картинка.
+THUMBNAIL_WIDTHS = (320, 640)
+THUMBNAIL_FORMATS = ('JPEG', 'WEBP') if features.check('webp') else ('JPEG',)
+
+
+def size_variants(size):
+    """Варианты размера: (формат, ширина, геометрия, опции).
+
+    Пропорции полного размера сохраняются, JPEG полной ширины совпадает
+    с миниатюрой, которую строит тег {% thumbnail %} с теми же опциями.
+    """
+    geometry, options = THUMBNAIL_SIZES[size]
+    width, height = (int(side) for side in geometry.split('x'))
+    widths = [w for w in THUMBNAIL_WIDTHS if w < width] + [width]
+    return [
+        (
+            image_format,
+            w,
+            f'{w}x{round(height * w / width)}',
+            {**options, 'format': image_format},
+        )
+        for image_format in THUMBNAIL_FORMATS
+        for w in widths
+    ]
+
+
+THUMBNAIL_VARIANTS = tuple(
+    (geometry, options)
+    for size in THUMBNAIL_SIZES
+    for _, _, geometry, options in size_variants(size)
+)
+
+_executor = None
+
+
+def generate_thumbnails(name):
+    """Создаёт все варианты миниатюр для файла из хранилища."""
+    from sorl.thumbnail import get_thumbnail
+    from sorl.thumbnail.images import ImageFile
+
+    # Ключ миниатюры в sorl зависит от хранилища исходного файла,
+    # поэтому файл открывается тем же хранилищем, что и Post.image.
+    source = ImageFile(name, post_image_storage)
+    started = time.perf_counter()
+    for geometry, options in THUMBNAIL_VARIANTS:
+        get_thumbnail(source, geometry, **options)
+    THUMBNAIL_DURATION.observe(time.perf_counter() - started)
+    # Процессы пула завершаются без atexit, так что файл метрик
+    # обновляется сразу.
+    store.flush()
+    return name
+
+
+def _init_worker():
+    # Процессы запускаются через spawn и не наследуют соединения с БД.
+    django.setup()
+
+
+def make_executor(workers):
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+    )
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = make_executor(settings.THUMBNAIL_WORKERS)
+    return _executor
+
+
+def _log_failure(future):
+    error = future.exception()
+    if error is not None:
+        logger.error('Не удалось создать миниатюры: %s', error)
+
+
+def queue_thumbnails(post):
+    """Ставит миниатюры поста в очередь после фиксации транзакции."""
+    if not post.image or not settings.THUMBNAIL_WORKERS:
+        return
+    name = post.image.name
+
+    def submit():
+        get_executor().submit(generate_thumbnails, name).add_done_callback(
+            _log_failure
+        )
+
+    transaction.on_commit(submit)
@@ -10,10 +10,17 @@ urlpatterns = [
     path("group/<slug:slug>/", views.group_posts, name="group_list"),
     path("profile/<str:username>/", views.profile, name="profile"),
     path("posts/<int:post_id>/", views.post_detail, name="post_detail"),
+    path("search/", views.search, name="search"),
     path("create/", views.post_create, name="post_create"),
     path("posts/<int:post_id>/edit/", views.post_edit, name="post_edit"),
     path("posts/<int:post_id>/comment", views.add_comment, name="add_comment"),
+    path(
+        "posts/<int:post_id>/comments/",
+        views.post_comments,
+        name="post_comments",
+    ),
     path("follow/", views.follow_index, name='follow_index'),
+    path("export/", views.export, name="export"),
     path(
         "profile/<str:username>/follow/",
         views.profile_follow,
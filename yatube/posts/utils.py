@@ -1,9 +1,220 @@
+from math import ceil
+
+from django.conf import settings
 from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 
 NUMBER_OF_POSTS_ON_PAGE = 10
+NUMBER_OF_COMMENTS_ON_PAGE = 20
+# Сколько первых страниц адресуется через ?page=N, дальше — только курсоры.
+KEYSET_OFFSET_PAGES = 5
+
+# Окно ссылок пагинатора: по краям и вокруг текущей страницы.
+PAGE_LINKS_ON_ENDS = 1
+PAGE_LINKS_ON_EACH_SIDE = 2
+ELLIPSIS = '…'
+
+CURSOR_NEXT = 'n'
+CURSOR_PREVIOUS = 'p'
+
+
+class KeysetPaginator(Paginator):
+    """Пагинация по ключу (дата, id) без COUNT(*) и глубоких OFFSET.
+
+    Первые KEYSET_OFFSET_PAGES страниц доступны по ?page=N, дальше
+    страницы открываются по курсору ?cursor=..., который хранит ключ
+    крайнего поста и номер страницы. Общее число постов неизвестно,
+    поэтому count и num_pages отражают только уже «увиденную» часть
+    ленты: текущую страницу и признак того, что за ней есть ещё одна.
+    """
+
+    keyset = True
+
+    def __init__(self, object_list, per_page,
+                 ordering=('-pub_date', '-pk'),
+                 offset_pages=KEYSET_OFFSET_PAGES):
+        super().__init__(object_list, per_page)
+        self.ordering = ordering
+        self.descending = ordering[0].startswith('-')
+        self.date_field, self.id_field = (
+            field.lstrip('-') for field in ordering
+        )
+        self.offset_pages = offset_pages
+        self.next_query = ''
+        self.previous_query = ''
+        self._count = 0
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def num_pages(self):
+        return max(1, ceil(self._count / self.per_page))
+
+    def get_page(self, number=None, cursor=None):
+        if cursor:
+            try:
+                return self._page_from_cursor(cursor)
+            except ValueError:
+                pass
+        try:
+            number = int(number)
+            if number < 1:
+                raise ValueError
+        except (TypeError, ValueError):
+            number = 1
+        rows = self._fetch(
+            self.per_page + 1, offset=(number - 1) * self.per_page
+        )
+        if not rows and number > 1:
+            return self.get_page(1)
+        return self._build_page(rows, number)
+
+    def _page_from_cursor(self, cursor):
+        direction, number, key = decode_cursor(cursor)
+        after = direction == CURSOR_NEXT
+        rows = self._fetch(self.per_page + 1, key=key, after=after)
+        if after:
+            if not rows:
+                return self.get_page(1)
+            return self._build_page(rows, number)
+        if len(rows) <= self.per_page:
+            # Дошли до начала ленты: отдаём обычную первую страницу.
+            return self.get_page(1)
+        rows = rows[:self.per_page][::-1]
+        return self._build_page(rows, number, has_next=True)
+
+    def _build_page(self, rows, number, has_next=None):
+        if has_next is None:
+            has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        self._count = (
+            (number - 1) * self.per_page + len(rows) + int(has_next)
+        )
+        if rows and has_next:
+            self.next_query = self._page_query(
+                CURSOR_NEXT, number + 1, rows[-1]
+            )
+        if rows and number > 1:
+            self.previous_query = self._page_query(
+                CURSOR_PREVIOUS, number - 1, rows[0]
+            )
+        return self._get_page(rows, number, self)
+
+    def _fetch(self, limit, offset=0, key=None, after=True):
+        """Строки после ключа (или с начала ленты) в порядке обхода.
+
+        При after=False строки идут в обратном порядке: от ключа к началу.
+        """
+        rows = self._ordered(reverse=not after)
+        if key is not None:
+            rows = rows.filter(self._keyset_filter(key, after))
+        return list(rows[offset:offset + limit])
+
+    def _ordered(self, reverse=False):
+        if not reverse:
+            return self.object_list.order_by(*self.ordering)
+        return self.object_list.order_by(
+            *(field[1:] if field.startswith('-') else '-' + field
+              for field in self.ordering)
+        )
+
+    def _keyset_filter(self, key, after, fields=None):
+        date_field, id_field = fields or (self.date_field, self.id_field)
+        date, pk = key
+        lookup = 'lt' if after == self.descending else 'gt'
+        bound = 'lte' if lookup == 'lt' else 'gte'
+        # date <= d AND (date < d OR id < pk): один диапазон по индексу.
+        return Q(**{f'{date_field}__{bound}': date}) & (
+            Q(**{f'{date_field}__{lookup}': date})
+            | Q(**{f'{id_field}__{lookup}': pk})
+        )
+
+    def _page_query(self, direction, number, row):
+        if number <= self.offset_pages:
+            return f'page={number}'
+        return f'cursor={encode_cursor(direction, number, self._key(row))}'
+
+    def _key(self, row):
+        if isinstance(row, dict):
+            # Строки из .values().
+            return row[self.date_field], row[self.id_field]
+        return (
+            getattr(row, self.date_field.split('__')[-1]),
+            getattr(row, self.id_field.split('__')[-1]),
+        )
+
+
+def elided_page_range(page_obj, on_each_side=PAGE_LINKS_ON_EACH_SIDE,
+                      on_ends=PAGE_LINKS_ON_ENDS):
+    """Номера страниц для ссылок: края и окно вокруг текущей.
+
+    Пропущенные участки обозначаются ELLIPSIS, так что ссылок всегда
+    не больше 2 * (on_each_side + on_ends) + 3 при любом числе страниц.
+    """
+    number = page_obj.number
+    num_pages = page_obj.paginator.num_pages
+    if num_pages <= (on_each_side + on_ends) * 2:
+        return list(range(1, num_pages + 1))
+    pages = []
+    if number > on_each_side + on_ends + 2:
+        pages.extend(range(1, on_ends + 1))
+        pages.append(ELLIPSIS)
+        pages.extend(range(number - on_each_side, number + 1))
+    else:
+        pages.extend(range(1, number + 1))
+    if number < num_pages - on_each_side - on_ends - 1:
+        pages.extend(range(number + 1, number + on_each_side + 1))
+        pages.append(ELLIPSIS)
+        pages.extend(range(num_pages - on_ends + 1, num_pages + 1))
+    else:
+        pages.extend(range(number + 1, num_pages + 1))
+    return pages
+
+
+def encode_cursor(direction, number, key):
+    date, pk = key
+    raw = f'{direction}:{number}:{date.isoformat()}:{pk}'
+    return urlsafe_base64_encode(force_bytes(raw))
+
+
+def decode_cursor(cursor):
+    raw = urlsafe_base64_decode(cursor).decode()
+    direction, number, rest = raw.split(':', 2)
+    date, pk = rest.rsplit(':', 1)
+    number, pk = int(number), int(pk)
+    date = parse_datetime(date)
+    if direction not in (CURSOR_NEXT, CURSOR_PREVIOUS) or date is None:
+        raise ValueError('Некорректный курсор')
+    return direction, max(number, 1), (date, pk)
+
+
+def comments_page(post, cursor=None):
+    """Комментарии поста от старых к новым; дальше первой страницы — курсор.
+
+    Курсор хранит (created, id) последнего показанного комментария.
+    """
+    paginator = KeysetPaginator(
+        post.comments.select_related("author"),
+        NUMBER_OF_COMMENTS_ON_PAGE,
+        ordering=("created", "pk"),
+        offset_pages=1,
+    )
+    return paginator.get_page(cursor=cursor)
 
 
-def paginator_func(request, posts):
+def paginator_func(request, posts, keyset=None):
+    if keyset is None:
+        keyset = settings.POSTS_KEYSET_PAGINATION
+    if keyset:
+        paginator = KeysetPaginator(posts, NUMBER_OF_POSTS_ON_PAGE)
+        return paginator.get_page(
+            request.GET.get("page"), request.GET.get("cursor")
+        )
     paginator = Paginator(posts, NUMBER_OF_POSTS_ON_PAGE)
     page_number = request.GET.get("page")
     return paginator.get_page(page_number)
@@ -1,15 +1,29 @@
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
-
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from .caching import (cache_page_versioned, group_scopes, group_validators,
+                      index_scopes, index_validators, post_scopes,
+                      post_validators, profile_scopes, profile_validators)
+from .counters import group_stats, user_stats
+from .export import export_jsonl, export_zip
+from .feeds import timeline_page
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post, User
-from .utils import paginator_func
+from .search import search_groups, search_posts
+from .thumbnails import queue_thumbnails
+from .utils import comments_page, paginator_func
 
-SAVE_GENERATED_PAGE_FOR = 20
+# Страницы сбрасываются сигналами, поэтому TTL может быть большим; в кэше
+# процесса он урезается до settings.PAGE_LOCAL_CACHE_TIMEOUT.
+SAVE_GENERATED_PAGE_FOR = 60 * 60
 
 
-@cache_page(SAVE_GENERATED_PAGE_FOR)
+@cache_page_versioned(
+    SAVE_GENERATED_PAGE_FOR, index_scopes, index_validators
+)
 def index(request):
     template = "posts/index.html"
     posts = Post.objects.select_related("author", "group")
@@ -19,20 +33,29 @@ def index(request):
     return render(request, template, context)
 
 
+@cache_page_versioned(
+    SAVE_GENERATED_PAGE_FOR, group_scopes, group_validators
+)
 def group_posts(request, slug):
     template = "posts/group_list.html"
-    group = get_object_or_404(Group, slug=slug)
+    group = get_object_or_404(Group.objects.select_related("stats"), slug=slug)
     posts = group.posts.select_related("author")
     context = {
         "page_obj": paginator_func(request, posts),
         "group": group,
+        "group_stats": group_stats(group),
     }
     return render(request, template, context)
 
 
+@cache_page_versioned(
+    SAVE_GENERATED_PAGE_FOR, profile_scopes, profile_validators
+)
 def profile(request, username):
     template = "posts/profile.html"
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related("stats"), username=username
+    )
     posts = author.posts.select_related("group")
     following = False
     if request.user.is_authenticated:
@@ -40,23 +63,74 @@ def profile(request, username):
             following = True
     context = {
         "author": author,
+        "author_stats": user_stats(author),
         "page_obj": paginator_func(request, posts),
         "following": following
     }
     return render(request, template, context)
 
 
+@cache_page_versioned(SAVE_GENERATED_PAGE_FOR, index_scopes)
+def search(request):
+    template = "posts/search.html"
+    query = request.GET.get("q", "")
+    context = {
+        "query": query,
+        "groups": search_groups(query),
+        "page_obj": paginator_func(request, search_posts(query), keyset=False),
+        "query_prefix": urlencode({"q": query}) + "&",
+    }
+    return render(request, template, context)
+
+
+@cache_page_versioned(
+    SAVE_GENERATED_PAGE_FOR, post_scopes, post_validators
+)
 def post_detail(request, post_id):
     template = "posts/post_detail.html"
     form = CommentForm(request.POST or None)
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related("author__stats", "group"), pk=post_id
+    )
     context = {
         "post": post,
+        "author_stats": user_stats(post.author),
         "form": form,
+        "comments": comments_page(post),
     }
     return render(request, template, context)
 
 
+def post_comments(request, post_id):
+    """Следующие комментарии после курсора: HTML-фрагмент или JSON."""
+    post = get_object_or_404(Post.objects.only("pk"), pk=post_id)
+    comments = comments_page(post, request.GET.get("cursor"))
+    if request.GET.get("format") != "json":
+        context = {
+            "post": post,
+            "comments": comments,
+        }
+        return render(request, "posts/includes/comments.html", context)
+    next_url = None
+    if comments.has_next():
+        next_url = "{}?{}&format=json".format(
+            reverse("posts:post_comments", args=(post.pk,)),
+            comments.paginator.next_query,
+        )
+    return JsonResponse({
+        "comments": [
+            {
+                "id": comment.pk,
+                "author": comment.author.username,
+                "text": comment.text,
+                "created": comment.created,
+            }
+            for comment in comments
+        ],
+        "next": next_url,
+    })
+
+
 @login_required
 def post_create(request):
     template = "posts/create_post.html"
@@ -68,6 +142,7 @@ def post_create(request):
             post = form.save(commit=False)
             post.author = request.user
             post.save()
+            queue_thumbnails(post)
             return redirect("posts:profile", post.author.username)
     form = PostForm()
 
@@ -87,6 +162,8 @@ def post_edit(request, post_id):
     if form.is_valid():
         post = form.save(commit=False)
         post.save()
+        if "image" in form.changed_data:
+            queue_thumbnails(post)
         return redirect("posts:post_detail", post.pk)
     context = {"form": form, "post": post, "is_edit": True}
     return render(request, template, context)
@@ -104,13 +181,29 @@ def add_comment(request, post_id):
     return redirect("posts:post_detail", post_id=post_id)
 
 
+@login_required
+def export(request):
+    """Данные пользователя потоком: JSONL или ZIP с картинками."""
+    user = request.user
+    if request.GET.get("format") == "zip":
+        response = StreamingHttpResponse(
+            export_zip(user), content_type="application/zip"
+        )
+        filename = f"yatube-{user.username}.zip"
+    else:
+        response = StreamingHttpResponse(
+            export_jsonl(user), content_type="application/x-ndjson"
+        )
+        filename = f"yatube-{user.username}.jsonl"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
 @login_required()
 def follow_index(request):
-    posts = Post.objects.filter(
-        author__following__user=request.user).select_related('author')
     template = 'posts/follow.html'
     context = {
-        'page_obj': paginator_func(request, posts),
+        'page_obj': timeline_page(request),
         'follow': True,
     }
     return render(request, template, context)
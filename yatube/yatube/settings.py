@@ -11,12 +11,21 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import sys
+import tempfile
 
 # from decouple import config, Csv
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+# Куда процессы пишут метрики, профили и лог медленных запросов; тесты
+# пишут во временный каталог, а не в рабочую копию.
+TESTING = sys.argv[1:2] == ["test"] or "pytest" in sys.modules
+RUNTIME_DIR = (
+    os.path.join(tempfile.gettempdir(), "yatube-test") if TESTING else BASE_DIR
+)
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
 
@@ -52,11 +61,15 @@ INSTALLED_APPS = [
     "users.apps.UsersConfig",
     "core.apps.CoreConfig",
     "about.apps.AboutConfig",
+    "api.apps.ApiConfig",
     "sorl.thumbnail",
     "debug_toolbar",
 ]
 
 MIDDLEWARE = [
+    "core.profiling.ProfilingMiddleware",
+    "core.metrics.MetricsMiddleware",
+    "core.slowqueries.SlowQueryMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -65,8 +78,34 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "debug_toolbar.middleware.DebugToolbarMiddleware",
+    "core.nplusone.NPlusOneMiddleware",
 ]
 
+# Повторные ленивые загрузки одной связи за запрос: "log" пишет
+# предупреждение, "raise" падает с NPlusOneError, None — проверка выключена.
+NPLUSONE_MODE = "log" if DEBUG else None
+NPLUSONE_THRESHOLD = 2
+
+# Доля запросов, которые профилируются cProfile; профили копятся по view
+# в PROFILING_DIR. Запрос с заголовком PROFILING_HEADER, подписанным
+# core.profiling.signed_token(), профилируется всегда.
+PROFILING_SAMPLE_RATE = 0.0
+PROFILING_DIR = os.path.join(RUNTIME_DIR, "profiles")
+PROFILING_HEADER = "X-Profile"
+PROFILING_SIGNATURE_MAX_AGE = 60 * 60
+
+# Метрики каждого процесса сбрасываются в свой файл в METRICS_DIR не реже
+# раза в METRICS_FLUSH_INTERVAL секунд; /metrics отдаёт их сумму
+# в формате Prometheus адресам из METRICS_ALLOWED_IPS.
+METRICS_DIR = os.path.join(RUNTIME_DIR, "metrics")
+METRICS_FLUSH_INTERVAL = 5
+METRICS_ALLOWED_IPS = ["127.0.0.1"]
+
+# SQL дольше SLOW_QUERY_THRESHOLD_MS миллисекунд пишется с планом в
+# SLOW_QUERY_LOG; сводку строит manage.py slow_queries. None — выключено.
+SLOW_QUERY_THRESHOLD_MS = 100
+SLOW_QUERY_LOG = os.path.join(RUNTIME_DIR, "slow_queries.jsonl")
+
 ROOT_URLCONF = "yatube.urls"
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
@@ -150,11 +189,34 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Ленты постов листаются по ключу (pub_date, id) вместо COUNT(*) + OFFSET.
+POSTS_KEYSET_PAGINATION = True
+# Посты авторов с большим числом подписчиков не раскладываются по лентам,
+# а подмешиваются при чтении ленты подписок.
+FEED_FANOUT_THRESHOLD = 1000
+
+# Загруженные картинки больше IMAGE_MAX_PIXELS отклоняются, остальные
+# уменьшаются до IMAGE_MAX_SIDE по большей стороне.
+IMAGE_MAX_PIXELS = 50_000_000
+IMAGE_MAX_SIDE = 2048
+
+# Процессы, в которых миниатюры создаются сразу после загрузки картинки;
+# 0 — миниатюры создаются при первом показе поста.
+THUMBNAIL_WORKERS = 2
+# Хранилище ключей миниатюр, умеющее отдавать их пачкой на всю страницу.
+THUMBNAIL_KVSTORE = 'posts.kvstore.KVStore'
+
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+# TTL страниц, пока кэш по умолчанию свой у каждого процесса: сброс
+# версий в одном процессе не виден другим.
+PAGE_LOCAL_CACHE_TIMEOUT = 20
+# Сколько секунд браузер отдаёт анонимную страницу ленты
+# без проверки ETag; 0 — проверять каждый раз и получать 304.
+PAGE_MAX_AGE = 0
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
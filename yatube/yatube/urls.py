@@ -18,6 +18,8 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core.views import metrics
+
 handler404 = 'core.views.page_not_found'
 handler403 = 'core.views.csrf_failure'
 
@@ -26,7 +28,9 @@ urlpatterns = [
     path("admin/", admin.site.urls),
     path("auth/", include("users.urls")),
     path("about/", include("about.urls", namespace="about")),
+    path("api/v1/", include("api.urls", namespace="api")),
     path("auth/", include("django.contrib.auth.urls")),
+    path("metrics", metrics, name="metrics"),
 ]
 if settings.DEBUG:
     import debug_toolbar